@@ -1,3 +1,92 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from unittest import mock
+import hashlib
+import jwt
+import time
+
+from Auth.funcs import generate_token
+from LiveFire import global_funcs
+from LiveFire.global_funcs import get_token_payload
 
 # Create your tests here.
+
+
+def expired_token(user_id):
+    payload = {'user_id': user_id, 'exp': int(time.time()) - 10, 'type': 'access'}
+    token = jwt.encode(payload, settings.JWT_SETTINGS['SECRET_KEY'], algorithm=settings.JWT_SETTINGS['ALGORITHM'])
+
+    return token, payload
+
+
+def digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        global_funcs._verified_tokens.clear()
+        global_funcs.token_cache_stats.update(hits=0, shared_hits=0, misses=0, evictions=0)
+        cache.clear()
+
+    def test_verified_token_is_cached(self):
+        token = generate_token(1)
+
+        with mock.patch('LiveFire.global_funcs.decode_token', wraps=global_funcs.decode_token) as decode:
+            self.assertEqual(get_token_payload(token)['user_id'], 1)
+            self.assertEqual(get_token_payload(token)['user_id'], 1)
+
+        decode.assert_called_once_with(token)
+        self.assertEqual(global_funcs.token_cache_stats, {'hits': 1, 'shared_hits': 0, 'misses': 1, 'evictions': 0})
+
+    def test_invalid_token_is_not_cached(self):
+        self.assertIsNone(get_token_payload('not.a.token'))
+        self.assertIsNone(get_token_payload('not.a.token'))
+
+        self.assertEqual(len(global_funcs._verified_tokens), 0)
+        self.assertEqual(global_funcs.token_cache_stats['misses'], 2)
+
+    def test_exp_is_enforced_on_in_process_hits(self):
+        # Cached while it was still valid
+        token, payload = expired_token(1)
+        global_funcs._verified_tokens[digest(token)] = payload
+
+        self.assertIsNone(get_token_payload(token))
+
+        self.assertNotIn(digest(token), global_funcs._verified_tokens)
+        self.assertEqual(global_funcs.token_cache_stats, {'hits': 0, 'shared_hits': 0, 'misses': 1, 'evictions': 1})
+
+    @override_settings(JWT_SETTINGS=dict(settings.JWT_SETTINGS, SHARED_CACHE=True))
+    def test_exp_is_enforced_on_shared_cache_hits(self):
+        token, payload = expired_token(1)
+        cache.set(f'jwt:{digest(token)}', payload)
+
+        self.assertIsNone(get_token_payload(token))
+
+        self.assertEqual(global_funcs.token_cache_stats, {'hits': 0, 'shared_hits': 0, 'misses': 1, 'evictions': 0})
+
+    @override_settings(JWT_SETTINGS=dict(settings.JWT_SETTINGS, SHARED_CACHE=True))
+    def test_shared_cache_hit(self):
+        token = generate_token(1)
+        get_token_payload(token)
+        global_funcs._verified_tokens.clear()
+
+        with mock.patch('LiveFire.global_funcs.decode_token') as decode:
+            self.assertEqual(get_token_payload(token)['user_id'], 1)
+
+        decode.assert_not_called()
+        self.assertEqual(global_funcs.token_cache_stats['shared_hits'], 1)
+
+    @override_settings(JWT_SETTINGS=dict(settings.JWT_SETTINGS, VERIFIED_CACHE_SIZE=2))
+    def test_least_recently_used_is_evicted(self):
+        first, second, third = generate_token(1), generate_token(2), generate_token(3)
+
+        get_token_payload(first)
+        get_token_payload(second)
+        get_token_payload(first)
+        get_token_payload(third)
+
+        self.assertEqual(list(global_funcs._verified_tokens), [digest(first), digest(third)])
+        self.assertEqual(global_funcs.token_cache_stats, {'hits': 1, 'shared_hits': 0, 'misses': 3, 'evictions': 1})
@@ -0,0 +1,121 @@
+from django.db.models import Case, When, F, Q, Sum, Count, OuterRef, Subquery, DecimalField, IntegerField
+from django.db.models.functions import Coalesce, Now, Greatest
+from django.contrib.postgres.search import TrigramWordSimilarity
+
+from Customers.models import Customers
+from Orders.models import Orders
+
+
+def _contribution(Order, order_status):
+
+    """
+        What an order in `order_status` adds to its customer's (MoneySpent, OrdersCount):
+        completed orders count as money spent, every order except cancelled ones is counted.
+    """
+
+    if order_status is None or order_status == Orders.OrderStatusChoices.CANCELLED:
+        return 0, 0
+
+    if order_status == Orders.OrderStatusChoices.COMPLETED:
+        return Order.OrderTotal, 1
+
+    return 0, 1
+
+
+def update_customer_totals(orders, previous_status=None):
+
+    """
+        Moves the customers' MoneySpent and OrdersCount from `previous_status`
+        (None for new orders) to the current status of each order, with one UPDATE.
+        Must run in the transaction that changes the orders.
+    """
+
+    deltas = {}
+
+    for Order in orders:
+
+        if Order.Customer_id is None:
+            continue
+
+        old_spent, old_count = _contribution(Order, previous_status)
+        new_spent, new_count = _contribution(Order, Order.OrderStatus)
+
+        spent, count = deltas.get(Order.Customer_id, (0, 0))
+        deltas[Order.Customer_id] = (spent + new_spent - old_spent, count + new_count - old_count)
+
+    deltas = {customer_id: delta for customer_id, delta in deltas.items() if delta != (0, 0)}
+
+    if not deltas:
+        return
+
+    # update() bypasses auto_now, UpdatedAt is set explicitly for list validators
+    Customers.objects.filter(pk__in=deltas.keys()).update(
+        UpdatedAt=Now(),
+        MoneySpent=Case(
+            *[When(pk=customer_id, then=F('MoneySpent') + spent) for customer_id, (spent, _) in deltas.items()],
+            default=F('MoneySpent'),
+        ),
+        OrdersCount=Case(
+            *[When(pk=customer_id, then=F('OrdersCount') + count) for customer_id, (_, count) in deltas.items()],
+            default=F('OrdersCount'),
+        ),
+    )
+
+
+def touch_customer_orders(customer_ids):
+
+    """
+        Bumps UpdatedAt of the customers' orders, which carry the customer's name
+        (CustomerName) in the order list and the sync feed. Call when a name changes
+        or a customer is deleted, in the same transaction.
+    """
+
+    # update() bypasses auto_now
+    return Orders.objects.filter(Customer_id__in=customer_ids).update(UpdatedAt=Now())
+
+
+def reconcile_customer_totals():
+
+    """
+        Recomputes MoneySpent and OrdersCount of every customer from Orders with a single UPDATE.
+        Only customers whose totals were off are written, so UpdatedAt (sync feed, list ETags)
+        moves only for them. Returns the number of customers updated.
+    """
+
+    orders = Orders.objects.filter(Customer=OuterRef('pk')).order_by().values('Customer')
+
+    spent = orders.filter(OrderStatus=Orders.OrderStatusChoices.COMPLETED).annotate(total=Sum('OrderTotal')).values('total')
+    count = orders.exclude(OrderStatus=Orders.OrderStatusChoices.CANCELLED).annotate(total=Count('id')).values('total')
+
+    spent = Coalesce(Subquery(spent, output_field=DecimalField()), 0, output_field=DecimalField())
+    count = Coalesce(Subquery(count, output_field=IntegerField()), 0)
+
+    return Customers.objects.annotate(
+        expected_spent=spent, expected_count=count
+    ).exclude(
+        MoneySpent=F('expected_spent'), OrdersCount=F('expected_count')
+    ).update(
+        UpdatedAt=Now(),
+        MoneySpent=spent,
+        OrdersCount=count,
+    )
+
+
+def search_customers(term):
+
+    """
+        Customers whose Name, Email or Phone contains something close to `term`
+        (trigram word similarity, served by the trigram indexes), best matches first.
+    """
+
+    return Customers.objects.filter(
+        Q(Name__trigram_word_similar=term) | Q(Email__trigram_word_similar=term) | Q(Phone__trigram_word_similar=term)
+    ).annotate(
+        # Greatest skips the NULL similarity of a missing Email or Phone
+        rank=Greatest(
+            TrigramWordSimilarity(term, 'Name'),
+            TrigramWordSimilarity(term, 'Email'),
+            TrigramWordSimilarity(term, 'Phone'),
+        )
+    ).order_by('-rank', 'id')
+
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from Customers.funcs import reconcile_customer_totals
+
+
+class Command(BaseCommand):
+    help = 'Recomputes MoneySpent and OrdersCount of every customer from the Orders table'
+
+    def handle(self, *args, **options):
+
+        updated = reconcile_customer_totals()
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {updated} customers'))
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customers',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Name', models.CharField(max_length=255)),
+                ('Email', models.EmailField(max_length=255, null=True)),
+                ('Phone', models.CharField(max_length=255, null=True)),
+                ('Address', models.CharField(max_length=255, null=True)),
+                ('CreatedAt', models.DateTimeField(auto_now_add=True)),
+                ('UpdatedAt', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
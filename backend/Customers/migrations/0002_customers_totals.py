@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:59
+
+from django.db import migrations, models
+from django.db.models import Sum, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_customer_totals(apps, schema_editor):
+    Customers = apps.get_model('Customers', 'Customers')
+    Orders = apps.get_model('Orders', 'Orders')
+
+    orders = Orders.objects.filter(Customer=OuterRef('pk')).order_by().values('Customer')
+
+    spent = orders.filter(OrderStatus='completed').annotate(total=Sum('OrderTotal')).values('total')
+    count = orders.exclude(OrderStatus='cancelled').annotate(total=Count('id')).values('total')
+
+    Customers.objects.update(
+        MoneySpent=Coalesce(Subquery(spent, output_field=models.DecimalField()), 0, output_field=models.DecimalField()),
+        OrdersCount=Coalesce(Subquery(count, output_field=models.IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Customers', '0001_initial'),
+        ('Orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customers',
+            name='MoneySpent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='customers',
+            name='OrdersCount',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_customer_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Customers', '0002_customers_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customers',
+            index=models.Index(fields=['CreatedAt'], name='customers_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customers',
+            index=models.Index(fields=['UpdatedAt'], name='customers_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:13
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Customers', '0003_customers_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='customers',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['Name'], name='customers_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customers',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['Email'], name='customers_email_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customers',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['Phone'], name='customers_phone_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
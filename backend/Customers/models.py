@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 
 # Create your models here.
 
@@ -8,5 +9,20 @@ class Customers(models.Model):
     Phone = models.CharField(max_length=255, null=True)
     Address = models.CharField(max_length=255, null=True)
 
+    # Denormalized from Orders, kept up to date by Customers.funcs.update_customer_totals
+    MoneySpent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    OrdersCount = models.IntegerField(default=0)
+
     CreatedAt = models.DateTimeField(auto_now_add=True)
-    UpdatedAt = models.DateTimeField(auto_now=True)
\ No newline at end of file
+    UpdatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['CreatedAt'], name='customers_created_idx'),
+            # Max() for the list ETag
+            models.Index(fields=['UpdatedAt'], name='customers_updated_idx'),
+            # Fuzzy search (Customers.funcs.search_customers)
+            GinIndex(fields=['Name'], opclasses=['gin_trgm_ops'], name='customers_name_trgm_idx'),
+            GinIndex(fields=['Email'], opclasses=['gin_trgm_ops'], name='customers_email_trgm_idx'),
+            GinIndex(fields=['Phone'], opclasses=['gin_trgm_ops'], name='customers_phone_trgm_idx'),
+        ]
@@ -4,10 +4,8 @@ class CustomersSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     Name = serializers.CharField()
 
-    MoneySpent = serializers.SerializerMethodField()
-    
-    def get_MoneySpent(self, obj):
-        return 0
+    MoneySpent = serializers.DecimalField(max_digits=14, decimal_places=2)
+    OrdersCount = serializers.IntegerField()
     
 
 class CustomerSerializer(serializers.Serializer):
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from Customers import funcs
+
+
+@shared_task(ignore_result=False)
+def reconcile_customer_totals():
+    return funcs.reconcile_customer_totals()
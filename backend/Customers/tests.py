@@ -1,3 +1,90 @@
+from django.db import connection
 from django.test import TestCase
+from unittest import skipUnless
+
+from Auth.funcs import generate_token
+from Customers.funcs import search_customers, reconcile_customer_totals
+from Customers.models import Customers
+from Orders.funcs import create_order
+from Orders.models import Orders
+from Products.models import Products
 
 # Create your tests here.
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Search uses pg_trgm')
+class SearchCustomersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = Customers.objects.create(Name='Анна Смирнова', Email='anna@example.com', Phone='+79161234567')
+        cls.boris = Customers.objects.create(Name='Борис Петров', Email=None, Phone=None)
+
+    def test_by_name_email_and_phone(self):
+        self.assertEqual(list(search_customers('Смирнова')), [self.anna])
+        self.assertEqual(list(search_customers('anna@example')), [self.anna])
+        self.assertEqual(list(search_customers('1234567')), [self.anna])
+
+    def test_typo_and_missing_fields(self):
+        self.assertEqual(list(search_customers('Петроф')), [self.boris])
+
+
+class CustomerTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customers.objects.create(Name='Customer')
+        cls.candle = Products.objects.create(Name='Candle', Price=10, Costs=4, Image='products/a.jpg', InStock=10)
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def set_status(self, Order, order_status):
+        return self.client.put('/api/v1/orders/update_order/', {'order_id': str(Order.pk), 'status': order_status}, content_type='application/json')
+
+    def assertTotals(self, spent, count):
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.MoneySpent, self.customer.OrdersCount), (spent, count))
+
+        # Nothing for the reconciliation to fix
+        self.assertEqual(reconcile_customer_totals(), 0)
+
+    def test_every_status_transition(self):
+        Order = create_order(self.customer.pk, None, {self.candle.pk: 2})
+        create_order(self.customer.pk, None, {self.candle.pk: 1})
+        self.assertTotals(0, 2)
+
+        for order_status, spent in [('packed', 0), ('completed', 20), ('in_progress', 0), ('completed', 20), ('packed', 0)]:
+            with self.subTest(status=order_status):
+                self.assertEqual(self.set_status(Order, order_status).status_code, 200)
+                self.assertTotals(spent, 2)
+
+        self.client.delete('/api/v1/orders/delete_order/', {'order_id': str(Order.pk)}, content_type='application/json')
+        self.assertTotals(0, 1)
+
+        # Cancelled orders can not change status any more
+        self.assertEqual(self.set_status(Order, 'completed').status_code, 400)
+        self.assertTotals(0, 1)
+
+
+class ReconcileCustomerTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = Customers.objects.create(Name='Anna', MoneySpent=10, OrdersCount=2)
+        cls.boris = Customers.objects.create(Name='Boris')
+
+        for order_status in [Orders.OrderStatusChoices.COMPLETED, Orders.OrderStatusChoices.IN_PROGRESS, Orders.OrderStatusChoices.CANCELLED]:
+            Orders.objects.create(Customer=cls.anna, OrderStatus=order_status, OrderTotal=10, OrderCosts=4)
+
+    def test_only_drifted_customers_are_written(self):
+        Customers.objects.filter(pk=self.anna.pk).update(MoneySpent=0)
+        boris_updated_at = Customers.objects.get(pk=self.boris.pk).UpdatedAt
+
+        self.assertEqual(reconcile_customer_totals(), 1)
+
+        self.anna.refresh_from_db()
+        self.assertEqual((self.anna.MoneySpent, self.anna.OrdersCount), (10, 2))
+        self.assertEqual(Customers.objects.get(pk=self.boris.pk).UpdatedAt, boris_updated_at)
+
+        self.assertEqual(reconcile_customer_totals(), 0)
@@ -20,6 +20,7 @@ from . import views
 
 urlpatterns = [
     path('get_customers/', views.CustomersView.as_view(), name='get_customers'),
+    path('search_customers/', views.SearchCustomersView.as_view(), name='search_customers'),
 
     path('create_customer/', views.CustomerView.as_view(), name='create_customer'),
     path('get_customer/', views.CustomerView.as_view(), name='get_customer'), 
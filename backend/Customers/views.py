@@ -1,23 +1,55 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import transaction
+from django.views import View
 
 from Customers.models import Customers
 from Customers.serializers import CustomersSerializer, CustomerSerializer
 from Customers.forms import CustomerForm, CustomerUpdateForm
+from Customers.funcs import search_customers, touch_customer_orders
+from Sync.models import Tombstones
+from Sync.funcs import record_deletions
 
-from LiveFire.global_funcs import auth_required, standard_response
+from LiveFire.global_funcs import auth_required, standard_response, standard_json_response
 from LiveFire import global_funcs
+from LiveFire.metrics import serialize_timer
 
 # Create your views here.
 
 @auth_required()
-class CustomersView(APIView):
-    def get(self, request):
+class CustomersView(View):
+    async def get(self, request):
 
         customers = Customers.objects.all()
-        serializer = CustomersSerializer(customers, many=True)
-        return standard_response(data=serializer.data)
+
+        async def build_response():
+            rows = [customer async for customer in customers]
+
+            with serialize_timer():
+                data = CustomersSerializer(rows, many=True).data
+
+            return standard_json_response(data=data)
+
+        return await global_funcs.aconditional_list_response(request, customers, build_response)
+
+
+@auth_required()
+class SearchCustomersView(View):
+    async def get(self, request):
+
+        fields = ['q']
+
+        if global_funcs.check_fileds_in_request(request, "GET", fields) and request.GET.get('q').strip():
+
+            page, next_cursor = await global_funcs.aoffset_paginate(search_customers(request.GET.get('q').strip()), request)
+
+            if page is None:
+                return standard_json_response(message='Incorrect cursor or limit', status_code=status.HTTP_400_BAD_REQUEST)
+
+            return standard_json_response(data=CustomerSerializer(page, many=True).data, next=next_cursor)
+
+        return standard_json_response(message='Incorrect fields', status_code=status.HTTP_400_BAD_REQUEST)
 
 
 @auth_required()
@@ -65,6 +97,7 @@ class CustomerView(APIView):
         if form.is_valid():
             if Customers.objects.filter(id=form.cleaned_data['customer_id']).exists():
                 customer = Customers.objects.get(id=form.cleaned_data['customer_id'])
+                renamed = form.cleaned_data.get('Name') is not None and form.cleaned_data['Name'] != customer.Name
 
                 if form.cleaned_data.get('Name') is not None:
                     customer.Name = form.cleaned_data.get('Name')
@@ -74,7 +107,13 @@ class CustomerView(APIView):
                     customer.Phone = form.cleaned_data.get('Phone')
                 if form.cleaned_data.get('Address') is not None:
                     customer.Address = form.cleaned_data.get('Address')
-                customer.save()
+
+                with transaction.atomic():
+                    customer.save()
+
+                    # Synced orders show the customer's name
+                    if renamed:
+                        touch_customer_orders([customer.pk])
 
                 return standard_response(message='Customer updated')
             else:
@@ -91,7 +130,10 @@ class CustomerView(APIView):
             if type(request.data.get('customer_id')) == int or request.data.get('customer_id').isdigit():
                 if Customers.objects.filter(id=request.data.get('customer_id')).exists():
                     customer = Customers.objects.get(id=request.data.get('customer_id'))
-                    customer.delete()
+                    with transaction.atomic():
+                        record_deletions(Tombstones.ModelChoices.CUSTOMERS, [customer.pk])
+                        touch_customer_orders([customer.pk])
+                        customer.delete()
                     return standard_response(message='Customer deleted')
                 else:
                     return standard_response(message='Customer not found', status_code=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,417 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum, Count
+from django.db.models.functions import TruncDate
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import time
+import uuid
+
+from Dashboard.models import DailyProfits
+from Orders.models import Orders
+from Products.models import Products
+from Customers.models import Customers
+
+
+DASHBOARD_KEY = 'dashboard:main'
+DASHBOARD_LOCK_KEY = 'dashboard:main:lock'
+
+# A snapshot is fresh for DASHBOARD_TTL seconds and served stale for up to DASHBOARD_STALE_TTL
+# while a single worker recomputes it
+DASHBOARD_TTL = 30
+DASHBOARD_STALE_TTL = 10 * 60
+DASHBOARD_LOCK_TIMEOUT = 30
+DASHBOARD_WAIT = 2
+
+# Deletes the lock only if it still holds the caller's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _due_day(due_date):
+
+    if isinstance(due_date, datetime):
+        return timezone.localtime(due_date).date() if timezone.is_aware(due_date) else due_date.date()
+
+    return due_date
+
+
+def _lock_rollup(mode):
+
+    """
+        Locks the DailyProfits table in `mode` until the end of the transaction (PostgreSQL only).
+        Incremental writers take ROW EXCLUSIVE, which does not conflict with itself,
+        rebuild_daily_profits takes SHARE ROW EXCLUSIVE, which conflicts with it.
+    """
+
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {connection.ops.quote_name(DailyProfits._meta.db_table)} IN {mode} MODE')
+
+
+def add_orders_to_rollup(orders, sign=1, status=None):
+
+    """
+        Adds (sign=1) or removes (sign=-1) the orders' totals to the DailyProfits rows
+        of their due day and status. `status` overrides Order.OrderStatus, which is
+        used to take an order out of the status it had before a change.
+        One UPDATE per touched (day, status) pair, rows are created on first use.
+    """
+
+    deltas = {}
+
+    for Order in orders:
+
+        if Order.DueDate is None:
+            continue
+
+        key = (_due_day(Order.DueDate), status or Order.OrderStatus)
+        revenue, costs, count = deltas.get(key, (0, 0, 0))
+        deltas[key] = (revenue + Order.OrderTotal, costs + Order.OrderCosts, count + 1)
+
+    if not deltas:
+        return
+
+    with transaction.atomic():
+
+        # Before reading the rows, so a concurrent rebuild cannot delete one read here
+        _lock_rollup('ROW EXCLUSIVE')
+
+        # Sorted so concurrent writers lock rows in the same order
+        for (day, order_status), (revenue, costs, count) in sorted(deltas.items()):
+
+            row, _ = DailyProfits.objects.get_or_create(Day=day, OrderStatus=order_status)
+
+            DailyProfits.objects.filter(pk=row.pk).update(
+                Revenue=F('Revenue') + sign * revenue,
+                Costs=F('Costs') + sign * costs,
+                Profit=F('Profit') + sign * (revenue - costs),
+                OrdersCount=F('OrdersCount') + sign * count,
+            )
+
+
+def rebuild_daily_profits():
+
+    """
+        Rebuilds the DailyProfits rollup from the Orders table.
+        Returns the number of daily rows.
+    """
+
+    rows = Orders.objects.exclude(DueDate=None).annotate(
+        Day=TruncDate('DueDate')
+    ).values('Day', 'OrderStatus').annotate(
+        Revenue=Sum('OrderTotal'),
+        Costs=Sum('OrderCosts'),
+        OrdersCount=Count('id'),
+    ).order_by()
+
+    with transaction.atomic():
+
+        # Writers that locked the rollup first are waited for, later ones wait until the
+        # rebuilt rows are committed. Taken before the orders are read, so every order
+        # is counted exactly once.
+        _lock_rollup('SHARE ROW EXCLUSIVE')
+
+        DailyProfits.objects.all().delete()
+
+        created = DailyProfits.objects.bulk_create([
+            DailyProfits(
+                Day=row['Day'],
+                OrderStatus=row['OrderStatus'],
+                Revenue=row['Revenue'],
+                Costs=row['Costs'],
+                Profit=row['Revenue'] - row['Costs'],
+                OrdersCount=row['OrdersCount'],
+            )
+            for row in rows
+        ], batch_size=1000)
+
+    return len(created)
+
+
+def move_order_in_rollup(Order, previous_status):
+
+    if previous_status == Order.OrderStatus:
+        return
+
+    with transaction.atomic():
+        add_orders_to_rollup([Order], sign=-1, status=previous_status)
+        add_orders_to_rollup([Order])
+
+
+def _dashboard_queries():
+
+    """
+        (queryset, aggregates) of the three dashboard queries, one per table.
+    """
+
+    # Get current date and date ranges
+    today = datetime.now()
+    current_month_start = today - timedelta(days=30)
+    last_month_start = today - timedelta(days=60)
+    last_month_end = today - timedelta(days=31)
+
+    created_this_month = Q(CreatedAt__gte=current_month_start, CreatedAt__lte=today)
+
+    return {
+        # Profits are read from the daily rollup, O(days) instead of O(orders)
+        'profits': (
+            DailyProfits.objects.filter(
+                Day__gte=last_month_start.date(),
+                Day__lte=today.date(),
+                OrderStatus=Orders.OrderStatusChoices.COMPLETED
+            ),
+            {
+                'current': Sum('Profit', filter=Q(Day__gte=current_month_start.date())),
+                'last': Sum('Profit', filter=Q(Day__lte=last_month_end.date())),
+            },
+        ),
+        'products': (
+            Products.objects.all(),
+            {
+                'count': Count('id'),
+                'new': Count('id', filter=created_this_month),
+                'in_stock': Sum('InStock', filter=Q(InStock__gt=0)),
+            },
+        ),
+        'customers': (
+            Customers.objects.all(),
+            {
+                'count': Count('id'),
+                'new': Count('id', filter=created_this_month),
+            },
+        ),
+    }
+
+
+def _dashboard_data(profits, products, customers):
+
+    current_month_profits = profits['current'] or 0
+    last_month_profits = profits['last'] or 0
+
+    # Calculate percentage change
+    if last_month_profits > 0:
+        percentage_change = ((current_month_profits - last_month_profits) / last_month_profits) * 100
+    else:
+        percentage_change = 100 if current_month_profits > 0 else 0
+
+    products_count = products['count']
+    new_products_count = products['new']
+
+    # Calculate percentage of new products
+    new_products_percentage = (new_products_count / products_count * 100) if products_count > 0 else 0
+
+    customers_count = customers['count']
+    new_customers_count = customers['new']
+
+    new_customers_percentage = (new_customers_count / customers_count * 100) if customers_count > 0 else 0
+
+    return {
+        'current_month_profits': current_month_profits,
+        'percentage_change': round(percentage_change, 2),
+
+        'products_count': products_count,
+        'new_products_count': new_products_count,
+        'new_products_percentage': round(new_products_percentage, 2),
+
+        'in_stock_products_count': products['in_stock'] or 0,
+
+        'customers_count': customers_count,
+        'new_customers_count': new_customers_count,
+        'new_customers_percentage': round(new_customers_percentage, 2)
+    }
+
+
+def compute_dashboard():
+
+    """
+        Computes the main dashboard metrics with three aggregate queries,
+        one per table.
+    """
+
+    return _dashboard_data(**{
+        name: queryset.aggregate(**aggregates)
+        for name, (queryset, aggregates) in _dashboard_queries().items()
+    })
+
+
+async def acompute_dashboard():
+
+    results = {}
+
+    for name, (queryset, aggregates) in _dashboard_queries().items():
+        results[name] = await queryset.aaggregate(**aggregates)
+
+    return _dashboard_data(**results)
+
+
+def _snapshot_data(entry):
+    if entry is not None and entry['expires'] > time.time():
+        return entry['data']
+
+    return None
+
+
+def _snapshot(data):
+    return {'data': data, 'expires': time.time() + DASHBOARD_TTL}
+
+
+def _acquire_lock():
+
+    """
+        Takes the recompute lock, returns its token, None when another worker holds it,
+        or False when the cache is unavailable: with IGNORE_EXCEPTIONS django-redis answers
+        None instead of raising, and nobody can hold the lock or store a snapshot.
+    """
+
+    token = uuid.uuid4().hex
+    added = cache.add(DASHBOARD_LOCK_KEY, token, DASHBOARD_LOCK_TIMEOUT)
+
+    if added is None:
+        return False
+
+    return token if added else None
+
+
+def _release_lock(token):
+
+    """
+        Releases the recompute lock if it still holds `token`: after DASHBOARD_LOCK_TIMEOUT
+        it may have expired and been taken by another worker.
+        Atomic on Redis, a get and a delete on other cache backends (tests).
+    """
+
+    client = getattr(cache, 'client', None)
+
+    if hasattr(client, 'get_client'):
+        try:
+            client.get_client(write=True).eval(
+                RELEASE_LOCK_SCRIPT, 1, client.make_key(DASHBOARD_LOCK_KEY), client.encode(token)
+            )
+        except Exception:
+            # The lock expires by itself
+            logger.warning('Could not release the dashboard lock', exc_info=True)
+
+        return
+
+    if cache.get(DASHBOARD_LOCK_KEY) == token:
+        cache.delete(DASHBOARD_LOCK_KEY)
+
+
+def refresh_dashboard(token=None):
+
+    """
+        Recomputes the dashboard snapshot and releases the recompute lock held with `token`.
+        Run by Dashboard.tasks.refresh_dashboard.
+    """
+
+    try:
+        data = compute_dashboard()
+        cache.set(DASHBOARD_KEY, _snapshot(data), DASHBOARD_STALE_TTL)
+        return data
+    finally:
+        if token is not None:
+            _release_lock(token)
+
+
+def get_dashboard():
+
+    """
+        Returns the cached dashboard snapshot.
+        A stale snapshot is served while a single background task recomputes it.
+        Without a snapshot the worker holding the lock computes it; the others wait
+        up to DASHBOARD_WAIT seconds for it. Computed right away while the cache is down.
+    """
+
+    from Dashboard.tasks import refresh_dashboard as refresh_dashboard_task
+
+    entry = cache.get(DASHBOARD_KEY)
+
+    if _snapshot_data(entry) is not None:
+        return entry['data']
+
+    token = _acquire_lock()
+
+    if entry is not None:
+        # The task releases the lock
+        if token:
+            refresh_dashboard_task.delay(token)
+
+        return entry['data']
+
+    if token:
+        return refresh_dashboard(token)
+
+    # No snapshot can show up while the cache is down, waiting would only add DASHBOARD_WAIT
+    if token is False:
+        return compute_dashboard()
+
+    deadline = time.time() + DASHBOARD_WAIT
+
+    while time.time() < deadline:
+        time.sleep(0.05)
+
+        entry = cache.get(DASHBOARD_KEY)
+
+        if entry is not None:
+            return entry['data']
+
+    # The recomputing worker is too slow or died, compute without caching
+    return compute_dashboard()
+
+
+async def aget_dashboard():
+
+    """
+        Async get_dashboard, waiting does not block the event loop.
+    """
+
+    from Dashboard.tasks import refresh_dashboard as refresh_dashboard_task
+
+    entry = await cache.aget(DASHBOARD_KEY)
+
+    if _snapshot_data(entry) is not None:
+        return entry['data']
+
+    token = await sync_to_async(_acquire_lock)()
+
+    if entry is not None:
+        if token:
+            # Eager tasks use the sync ORM, the broker client is sync as well
+            await sync_to_async(refresh_dashboard_task.delay)(token)
+
+        return entry['data']
+
+    if token is False:
+        return await acompute_dashboard()
+
+    if token:
+        try:
+            data = await acompute_dashboard()
+            await cache.aset(DASHBOARD_KEY, _snapshot(data), DASHBOARD_STALE_TTL)
+            return data
+        finally:
+            await sync_to_async(_release_lock)(token)
+
+    deadline = time.time() + DASHBOARD_WAIT
+
+    while time.time() < deadline:
+        await asyncio.sleep(0.05)
+
+        entry = await cache.aget(DASHBOARD_KEY)
+
+        if entry is not None:
+            return entry['data']
+
+    return await acompute_dashboard()
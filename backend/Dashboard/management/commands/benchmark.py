@@ -0,0 +1,218 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import subprocess
+import threading
+import random
+import json
+import time
+import math
+
+import requests
+
+from Auth.funcs import generate_token
+from Customers.models import Customers
+from Orders.models import Orders
+from Products.models import Products
+
+
+def percentile(values, percent):
+
+    """
+        Nearest-rank percentile of sorted `values`.
+    """
+
+    if not values:
+        return None
+
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def summarize(latencies, errors, wall_time):
+
+    latencies = sorted(latencies)
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall_time, 2) if wall_time else None,
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'max': latencies[-1] if latencies else None,
+        },
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Load-tests every api/v1 endpoint of a running server and reports throughput and latency percentiles as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per endpoint')
+        parser.add_argument('--endpoints', nargs='*', help='Only run these endpoints (names from the report)')
+        parser.add_argument('--writes', action='store_true', help='Also benchmark create_order (changes data)')
+        parser.add_argument('--user-id', type=int, default=1, help='User the JWT is issued for')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+        parser.add_argument('--compare', help='Previous report to print p50/p95/throughput next to')
+
+    def handle(self, *args, **options):
+
+        self.base_url = options['base_url'].rstrip('/')
+        self.timeout = options['timeout']
+        self.headers = {'Authorization': f'Bearer {generate_token(options["user_id"])}'}
+        self.local = threading.local()
+
+        endpoints = self.endpoints(options['writes'])
+
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoints)
+
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+
+            endpoints = {name: endpoints[name] for name in options['endpoints']}
+
+        dataset = {
+            'customers': Customers.objects.count(),
+            'products': Products.objects.count(),
+            'orders': Orders.objects.count(),
+        }
+
+        results = {}
+
+        for name, request in endpoints.items():
+            self.stderr.write(f'{name}...')
+            results[name] = self.run_endpoint(request, options['requests'], options['warmup'], options['concurrency'])
+
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'started_at': timezone.now().isoformat(),
+                'base_url': self.base_url,
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'dataset': dataset,
+            },
+            'endpoints': results,
+        }
+
+        output = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def endpoints(self, writes):
+
+        """
+            {name: callable returning (method, path, params, json body)}.
+            Ids are sampled from the database the server is expected to use.
+        """
+
+        order_ids = list(Orders.objects.order_by('-pk').values_list('pk', flat=True)[:1000])
+        product_ids = list(Products.objects.order_by('-pk').values_list('pk', flat=True)[:1000])
+        customer_ids = list(Customers.objects.order_by('-pk').values_list('pk', flat=True)[:1000])
+
+        if not (order_ids and product_ids and customer_ids):
+            raise CommandError('The database is empty, run seed_data first')
+
+        endpoints = {
+            'get_products': lambda: ('GET', '/api/v1/products/get_products/', {}, None),
+            'get_product': lambda: ('GET', '/api/v1/products/get_product/', {'product_id': random.choice(product_ids)}, None),
+            'get_customers': lambda: ('GET', '/api/v1/customers/get_customers/', {}, None),
+            'get_customer': lambda: ('GET', '/api/v1/customers/get_customer/', {'customer_id': random.choice(customer_ids)}, None),
+            'get_order': lambda: ('GET', '/api/v1/orders/get_order/', {'order_id': random.choice(order_ids)}, None),
+            'main_dashboard': lambda: ('GET', '/api/v1/dashboard/main_dashboard/', {}, None),
+        }
+
+        for order_type in ['all', 'active', 'packed', 'completed', 'cancelled']:
+            endpoints[f'get_orders_{order_type}'] = lambda order_type=order_type: (
+                'GET', '/api/v1/orders/get_orders/', {'type': order_type}, None
+            )
+
+        if writes:
+            endpoints['create_order'] = lambda: ('POST', '/api/v1/orders/create_order/', {}, {
+                'customer_id': random.choice(customer_ids),
+                'due_date': (timezone.localdate() + timedelta(days=7)).isoformat(),
+                'cart_data': {str(product_id): 1 for product_id in random.sample(product_ids, min(3, len(product_ids)))},
+            })
+
+        return endpoints
+
+    def session(self):
+
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers.update(self.headers)
+
+        return self.local.session
+
+    def call(self, request):
+
+        method, path, params, body = request()
+
+        started = time.perf_counter()
+
+        try:
+            response = self.session().request(method, self.base_url + path, params=params, json=body, timeout=self.timeout)
+            response.content
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+
+        return round((time.perf_counter() - started) * 1000, 3), ok
+
+    def run_endpoint(self, request, count, warmup, concurrency):
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+            list(executor.map(lambda _: self.call(request), range(warmup)))
+
+            started = time.perf_counter()
+            calls = list(executor.map(lambda _: self.call(request), range(count)))
+            wall_time = time.perf_counter() - started
+
+        return summarize(
+            [latency for latency, ok in calls if ok],
+            sum(1 for _, ok in calls if not ok),
+            wall_time,
+        )
+
+    def compare(self, path, results):
+
+        with open(path) as file:
+            baseline = json.load(file)['endpoints']
+
+        for name, result in results.items():
+
+            before = baseline.get(name)
+
+            if not before or not before['requests'] or not result['requests']:
+                continue
+
+            self.stderr.write(
+                f"{name}: p50 {before['latency_ms']['p50']} -> {result['latency_ms']['p50']} ms, "
+                f"p95 {before['latency_ms']['p95']} -> {result['latency_ms']['p95']} ms, "
+                f"{before['throughput_rps']} -> {result['throughput_rps']} rps"
+            )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from Dashboard.funcs import rebuild_daily_profits
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the DailyProfits rollup from the Orders table'
+
+    def handle(self, *args, **options):
+
+        rows = rebuild_daily_profits()
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily rows'))
@@ -0,0 +1,137 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+import random
+
+from Customers.models import Customers
+from Customers.funcs import reconcile_customer_totals
+from Orders.models import Orders, OrderItems
+from Products.models import Products
+
+
+# Roughly what a running shop looks like: most orders are done, a few are cancelled
+STATUS_WEIGHTS = {
+    Orders.OrderStatusChoices.IN_PROGRESS: 10,
+    Orders.OrderStatusChoices.PACKED: 5,
+    Orders.OrderStatusChoices.COMPLETED: 75,
+    Orders.OrderStatusChoices.CANCELLED: 10,
+}
+
+
+class Command(BaseCommand):
+    help = 'Seeds synthetic customers, products and orders with bulk inserts (for benchmarks and query plans)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--max-items', type=int, default=5, help='Maximum lines per order')
+        parser.add_argument('--days', type=int, default=365, help='Orders are spread over this many past days')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for a reproducible dataset')
+
+    def handle(self, *args, **options):
+
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        customer_ids = self.seed_customers(rng, options['customers'], batch_size)
+        products = self.seed_products(rng, options['products'], batch_size)
+
+        if options['orders'] and (not customer_ids or not products):
+            self.stderr.write('Orders need at least one customer and one product')
+            return
+
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        now = timezone.now()
+
+        created = 0
+
+        while created < options['orders']:
+
+            count = min(batch_size, options['orders'] - created)
+
+            with transaction.atomic():
+
+                orders = []
+                carts = []
+
+                for _ in range(count):
+
+                    cart = {
+                        product.pk: (product, rng.randint(1, 3))
+                        for product in rng.sample(products, rng.randint(1, min(options['max_items'], len(products))))
+                    }
+                    order_date = now - timedelta(seconds=rng.randint(0, options['days'] * 24 * 60 * 60))
+
+                    orders.append(Orders(
+                        Customer_id=rng.choice(customer_ids),
+                        DueDate=order_date + timedelta(days=rng.randint(1, 14)),
+                        OrderStatus=rng.choices(statuses, weights)[0],
+                        OrderTotal=sum(product.Price * quantity for product, quantity in cart.values()),
+                        OrderCosts=sum(product.Costs * quantity for product, quantity in cart.values()),
+                    ))
+                    carts.append((order_date, cart))
+
+                Orders.objects.bulk_create(orders, batch_size=batch_size)
+
+                # auto_now_add ignores the value given to bulk_create, bulk_update writes it as is
+                for Order, (order_date, _) in zip(orders, carts):
+                    Order.OrderDate = order_date
+
+                Orders.objects.bulk_update(orders, ['OrderDate'], batch_size=batch_size)
+
+                OrderItems.objects.bulk_create([
+                    OrderItems(Order=Order, Product=product, Quantity=quantity, Price=product.Price * quantity)
+                    for Order, (_, cart) in zip(orders, carts)
+                    for product, quantity in cart.values()
+                ], batch_size=batch_size)
+
+            created += count
+            self.stdout.write(f'Orders: {created}/{options["orders"]}')
+
+        # Derived data is rebuilt once instead of being maintained per order
+        call_command('rebuild_daily_profits', stdout=self.stdout)
+        reconcile_customer_totals()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(customer_ids)} customers, {len(products)} products and {created} orders'
+        ))
+
+    def seed_customers(self, rng, count, batch_size):
+
+        customers = Customers.objects.bulk_create([
+            Customers(
+                Name=f'Customer {rng.randrange(10 ** 8)}',
+                Email=f'customer{index}.{rng.randrange(10 ** 8)}@example.com',
+                Phone=f'+7{rng.randrange(10 ** 10):010d}',
+                Address=f'Street {rng.randint(1, 500)}, {rng.randint(1, 200)}',
+            )
+            for index in range(count)
+        ], batch_size=batch_size)
+
+        return [customer.pk for customer in customers]
+
+    def seed_products(self, rng, count, batch_size):
+
+        products = []
+
+        for index in range(count):
+
+            costs = Decimal(rng.randint(100, 2000))
+
+            products.append(Products(
+                Name=f'Candle {index} {rng.randrange(10 ** 6)}',
+                Description='Synthetic product',
+                Costs=costs,
+                Price=costs * Decimal(rng.choice(['1.5', '2', '2.5', '3'])),
+                # Placeholder key, there is no object behind it in storage
+                Image=f'products/seed_{index}.jpg',
+                InStock=rng.randint(0, 500),
+            ))
+
+        return Products.objects.bulk_create(products, batch_size=batch_size)
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProfits',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Day', models.DateField()),
+                ('OrderStatus', models.CharField(max_length=255)),
+                ('Revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('Costs', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('Profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('OrdersCount', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyprofits',
+            constraint=models.UniqueConstraint(fields=('Day', 'OrderStatus'), name='daily_profits_day_status_unique'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_profits(apps, schema_editor):
+    Orders = apps.get_model('Orders', 'Orders')
+    DailyProfits = apps.get_model('Dashboard', 'DailyProfits')
+
+    rows = Orders.objects.exclude(DueDate=None).annotate(
+        Day=TruncDate('DueDate')
+    ).values('Day', 'OrderStatus').annotate(
+        Revenue=Sum('OrderTotal'),
+        Costs=Sum('OrderCosts'),
+        OrdersCount=Count('id'),
+    ).order_by()
+
+    DailyProfits.objects.bulk_create([
+        DailyProfits(
+            Day=row['Day'],
+            OrderStatus=row['OrderStatus'],
+            Revenue=row['Revenue'],
+            Costs=row['Costs'],
+            Profit=row['Revenue'] - row['Costs'],
+            OrdersCount=row['OrdersCount'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dashboard', '0001_initial'),
+        ('Orders', '0002_orders_updatedat'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_daily_profits, migrations.RunPython.noop),
+    ]
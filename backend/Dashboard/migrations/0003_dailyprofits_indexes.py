@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dashboard', '0002_populate_daily_profits'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyprofits',
+            index=models.Index(fields=['OrderStatus', 'Day'], name='daily_profits_status_day_idx'),
+        ),
+    ]
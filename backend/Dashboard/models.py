@@ -1,3 +1,28 @@
 from django.db import models
 
 # Create your models here.
+
+
+class DailyProfits(models.Model):
+
+    """
+        Per-day, per-status totals of orders, bucketed by DueDate.
+        Maintained incrementally by Dashboard.funcs, rebuilt by the rebuild_daily_profits command.
+    """
+
+    Day = models.DateField()
+    OrderStatus = models.CharField(max_length=255)
+
+    Revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    Costs = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    Profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    OrdersCount = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['Day', 'OrderStatus'], name='daily_profits_day_status_unique'),
+        ]
+        indexes = [
+            # Dashboard profits: one status over a range of days
+            models.Index(fields=['OrderStatus', 'Day'], name='daily_profits_status_day_idx'),
+        ]
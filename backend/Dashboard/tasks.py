@@ -0,0 +1,13 @@
+from celery import shared_task
+
+from Dashboard import funcs
+
+
+@shared_task
+def refresh_dashboard(token=None):
+    funcs.refresh_dashboard(token)
+
+
+@shared_task(ignore_result=False)
+def rebuild_daily_profits():
+    return funcs.rebuild_daily_profits()
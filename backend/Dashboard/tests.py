@@ -1,3 +1,294 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from datetime import date, timedelta
+from io import StringIO
+from asgiref.sync import async_to_sync
+from unittest import mock, skipUnless
+import asyncio
+import threading
+import time
+
+from Auth.funcs import generate_token
+from Customers.models import Customers
+from Dashboard.funcs import (
+    DASHBOARD_KEY, DASHBOARD_LOCK_KEY, _dashboard_queries, _acquire_lock, add_orders_to_rollup, get_dashboard, aget_dashboard,
+    rebuild_daily_profits, refresh_dashboard,
+)
+from Dashboard.models import DailyProfits
+from Orders.funcs import create_order
+from Orders.models import Orders
+from Products.models import Products
 
 # Create your tests here.
+
+
+class SeedDataTests(TestCase):
+
+    def test_seeds_consistent_dataset(self):
+        call_command(
+            'seed_data', customers=20, products=10, orders=300, max_items=3, batch_size=100, seed=1,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Customers.objects.count(), 20)
+        self.assertEqual(Products.objects.count(), 10)
+        self.assertEqual(Orders.objects.count(), 300)
+
+        # Order totals match their lines, derived tables match the orders
+        for Order in Orders.objects.annotate(ItemsTotal=Sum('OrderItems__Price'))[:50]:
+            self.assertEqual(Order.OrderTotal, Order.ItemsTotal)
+
+        self.assertEqual(DailyProfits.objects.aggregate(total=Sum('OrdersCount'))['total'], 300)
+        self.assertEqual(
+            Customers.objects.aggregate(total=Sum('OrdersCount'))['total'],
+            Orders.objects.exclude(OrderStatus=Orders.OrderStatusChoices.CANCELLED).count(),
+        )
+
+        # Order dates are spread out instead of all being "now"
+        self.assertGreater(Orders.objects.values('OrderDate').distinct().count(), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL')
+class DashboardPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+
+        # Ten years of rollup rows for every status
+        DailyProfits.objects.bulk_create([
+            DailyProfits(Day=today - timedelta(days=day), OrderStatus=status, Revenue=100, Costs=40, Profit=60, OrdersCount=1)
+            for day in range(3650)
+            for status in Orders.OrderStatusChoices.values
+        ], batch_size=5000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE "Dashboard_dailyprofits"')
+
+    def test_profits_use_index(self):
+        queryset, _ = _dashboard_queries()['profits']
+
+        plan = queryset.explain()
+
+        self.assertNotIn('Seq Scan on "Dashboard_dailyprofits"', plan, plan)
+
+
+class DashboardRefreshTests(TestCase):
+
+    def setUp(self):
+        cache.delete_many([DASHBOARD_KEY, DASHBOARD_LOCK_KEY])
+
+    def test_stale_snapshot_is_served_while_a_task_refreshes_it(self):
+        cache.set(DASHBOARD_KEY, {'data': {'stale': True}, 'expires': time.time() - 1})
+
+        with mock.patch('Dashboard.tasks.refresh_dashboard.delay') as delay:
+            self.assertEqual(get_dashboard(), {'stale': True})
+            self.assertEqual(get_dashboard(), {'stale': True})
+
+        # The lock lets a single refresh through, the task gets the lock's token
+        delay.assert_called_once_with(cache.get(DASHBOARD_LOCK_KEY))
+
+    def test_eager_refresh(self):
+        cache.set(DASHBOARD_KEY, {'data': {'stale': True}, 'expires': time.time() - 1})
+
+        # Tasks run eagerly without a broker
+        self.assertEqual(get_dashboard(), {'stale': True})
+        self.assertEqual(get_dashboard()['products_count'], 0)
+        self.assertIsNone(cache.get(DASHBOARD_LOCK_KEY))
+
+    def test_expired_lock_is_not_released_by_its_old_holder(self):
+        token = _acquire_lock()
+
+        # The lock expired while the task was queued and another worker took it
+        cache.delete(DASHBOARD_LOCK_KEY)
+        other = _acquire_lock()
+
+        refresh_dashboard(token)
+
+        self.assertEqual(cache.get(DASHBOARD_LOCK_KEY), other)
+
+        refresh_dashboard(other)
+
+        self.assertIsNone(cache.get(DASHBOARD_LOCK_KEY))
+
+
+class DashboardSingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.delete_many([DASHBOARD_KEY, DASHBOARD_LOCK_KEY])
+        self.calls = 0
+
+    def slow_compute(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return {'call': self.calls}
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+
+        def request():
+            results.append(get_dashboard())
+
+        with mock.patch('Dashboard.funcs.compute_dashboard', self.slow_compute):
+            threads = [threading.Thread(target=request) for _ in range(5)]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        # The waiters got the snapshot computed by the lock holder
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'call': 1}] * 5)
+        self.assertIsNone(cache.get(DASHBOARD_LOCK_KEY))
+
+    def test_concurrent_async_misses_compute_once(self):
+
+        async def slow_acompute():
+            self.calls += 1
+            await asyncio.sleep(0.2)
+            return {'call': self.calls}
+
+        async def requests():
+            return await asyncio.gather(*[aget_dashboard() for _ in range(5)])
+
+        with mock.patch('Dashboard.funcs.acompute_dashboard', slow_acompute):
+            results = async_to_sync(requests)()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'call': 1}] * 5)
+        self.assertIsNone(cache.get(DASHBOARD_LOCK_KEY))
+
+    def test_cache_unavailable_does_not_wait(self):
+        async def acompute():
+            return self.slow_compute()
+
+        # What django-redis answers with IGNORE_EXCEPTIONS while Redis is down
+        with mock.patch.object(cache, 'add', return_value=None), mock.patch.object(cache, 'get', return_value=None), \
+                mock.patch.object(cache, 'aget', return_value=None), \
+                mock.patch('Dashboard.funcs.compute_dashboard', self.slow_compute), \
+                mock.patch('Dashboard.funcs.acompute_dashboard', acompute):
+
+            started = time.monotonic()
+
+            self.assertEqual(get_dashboard(), {'call': 1})
+            self.assertEqual(async_to_sync(aget_dashboard)(), {'call': 2})
+
+            # Two computations, no DASHBOARD_WAIT
+            self.assertLess(time.monotonic() - started, 1)
+
+
+class DailyProfitsRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customers.objects.create(Name='Customer')
+        cls.candle = Products.objects.create(Name='Candle', Price=10, Costs=4, Image='products/a.jpg', InStock=10)
+        cls.box = Products.objects.create(Name='Gift box', Price=3, Costs=1, Image='products/b.jpg', InStock=10)
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def rollup(self):
+        return {
+            (row.Day, row.OrderStatus): (row.Revenue, row.Costs, row.Profit, row.OrdersCount)
+            for row in DailyProfits.objects.exclude(OrdersCount=0)
+        }
+
+    def assertRollupMatchesRebuild(self):
+        rollup = self.rollup()
+        rebuild_daily_profits()
+        self.assertEqual(rollup, self.rollup())
+
+    def test_create_status_change_and_cancel(self):
+        today = date.today()
+
+        first = create_order(self.customer.pk, today, {self.candle.pk: 2, self.box.pk: 1})
+        create_order(self.customer.pk, today, {self.candle.pk: 1})
+        # Orders without a due date are not in the rollup
+        create_order(self.customer.pk, None, {self.box.pk: 1})
+
+        self.assertEqual(self.rollup(), {(today, Orders.OrderStatusChoices.IN_PROGRESS): (33, 13, 20, 2)})
+        self.assertRollupMatchesRebuild()
+
+        self.client.put('/api/v1/orders/update_order/', {'order_id': str(first.pk), 'status': 'packed'}, content_type='application/json')
+
+        self.assertEqual(self.rollup(), {
+            (today, Orders.OrderStatusChoices.IN_PROGRESS): (10, 4, 6, 1),
+            (today, Orders.OrderStatusChoices.PACKED): (23, 9, 14, 1),
+        })
+        self.assertRollupMatchesRebuild()
+
+        self.client.delete('/api/v1/orders/delete_order/', {'order_id': str(first.pk)}, content_type='application/json')
+
+        self.assertEqual(self.rollup(), {
+            (today, Orders.OrderStatusChoices.IN_PROGRESS): (10, 4, 6, 1),
+            (today, Orders.OrderStatusChoices.CANCELLED): (23, 9, 14, 1),
+        })
+        self.assertRollupMatchesRebuild()
+
+    def test_unchanged_status_is_not_counted_twice(self):
+        Order = create_order(self.customer.pk, date.today(), {self.candle.pk: 1})
+
+        self.client.put('/api/v1/orders/update_order/', {'order_id': str(Order.pk), 'status': 'in_progress'}, content_type='application/json')
+
+        self.assertEqual(self.rollup(), {(date.today(), Orders.OrderStatusChoices.IN_PROGRESS): (10, 4, 6, 1)})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'The rollup is locked on PostgreSQL')
+class RebuildDailyProfitsTests(TransactionTestCase):
+
+    def test_increment_during_rebuild_is_not_lost(self):
+        customer = Customers.objects.create(Name='Customer')
+
+        def create_order():
+            try:
+                with transaction.atomic():
+                    Order = Orders.objects.create(
+                        Customer=customer, DueDate=date.today(), OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
+                        OrderTotal=10, OrderCosts=4,
+                    )
+                    add_orders_to_rollup([Order])
+            finally:
+                connections.close_all()
+
+        create_order()
+
+        deleted = threading.Event()
+        resume = threading.Event()
+        bulk_create = DailyProfits.objects.bulk_create
+
+        def paused_bulk_create(*args, **kwargs):
+            # The old rows are deleted and the orders counted, the new rows are not written yet
+            deleted.set()
+            resume.wait(5)
+            return bulk_create(*args, **kwargs)
+
+        def rebuild():
+            try:
+                rebuild_daily_profits()
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(DailyProfits.objects, 'bulk_create', paused_bulk_create):
+            rebuilder = threading.Thread(target=rebuild)
+            rebuilder.start()
+            deleted.wait(5)
+
+            writer = threading.Thread(target=create_order)
+            writer.start()
+            writer.join(0.5)
+
+            # Waits for the rebuild instead of incrementing a row the rebuild deleted
+            self.assertTrue(writer.is_alive())
+
+            resume.set()
+            rebuilder.join()
+            writer.join()
+
+        self.assertEqual(DailyProfits.objects.get(OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS).OrdersCount, 2)
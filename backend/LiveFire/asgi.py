@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LiveFire.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup, needs the apps to be loaded
+from Orders.events import ORDER_EVENTS_PATH, order_events_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+
+    # Server-sent order events are served outside of Django's request handling,
+    # which does not notice a client that went away while a response is streaming
+    if scope['type'] == 'http' and scope['path'] == ORDER_EVENTS_PATH:
+        return await order_events_app(scope, receive, send)
+
+    return await django_application(scope, receive, send)
@@ -0,0 +1,19 @@
+"""
+    Celery application for work that should not run on the request thread.
+
+    Tasks live in the apps' tasks.py modules, views enqueue them after their transaction commits.
+    Without CELERY_BROKER_URL (tests, offline use) tasks run eagerly, in the calling process.
+
+        celery -A LiveFire worker
+        celery -A LiveFire beat      # scheduled jobs, settings.CELERY_BEAT_SCHEDULE
+"""
+
+from celery import Celery
+import os
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LiveFire.settings')
+
+app = Celery('LiveFire')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
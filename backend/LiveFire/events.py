@@ -0,0 +1,148 @@
+"""
+    Publish/subscribe bus for server-pushed events.
+
+    Events are published from sync code (views, after commit) and consumed by async subscribers
+    (SSE connections on the ASGI event loop), each with its own bounded queue.
+
+    settings.EVENTS['BACKEND']:
+        'memory' - delivered to subscribers of the same process only (single worker, tests)
+        'redis'  - published to a Redis channel; every process runs one listener that fans the
+                   events out to its local subscribers, so each event costs one message per process
+"""
+
+from django.conf import settings
+from contextlib import asynccontextmanager
+import threading
+import asyncio
+import logging
+import json
+
+import redis
+import redis.asyncio
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 256
+
+# Sent to a subscriber that fell QUEUE_SIZE events behind, it should reload its data
+RESYNC = {'type': 'resync'}
+
+
+class MemoryBus:
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        self.deliver(channel, event)
+
+    def deliver(self, channel, event):
+
+        with self._lock:
+            subscribers = [(loop, queue) for subscribed, loop, queue in self._subscribers if subscribed == channel]
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put, queue, event)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        entry = (channel, asyncio.get_running_loop(), queue)
+
+        with self._lock:
+            self._subscribers.add(entry)
+
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                self._subscribers.discard(entry)
+
+
+class RedisBus(MemoryBus):
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+        self._listeners = {}
+
+    def publish(self, channel, event):
+        try:
+            self._client.publish(channel, json.dumps(event, default=str))
+        except redis.RedisError:
+            logger.exception('Could not publish an event to %s', channel)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+
+        listener = self._listeners.get(channel)
+
+        if listener is None or listener.done():
+            self._listeners[channel] = asyncio.get_running_loop().create_task(self._listen(channel))
+
+        async with super().subscribe(channel) as queue:
+            yield queue
+
+    async def _listen(self, channel):
+
+        delay = 1
+
+        while True:
+            try:
+                client = redis.asyncio.Redis.from_url(self.url)
+
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(channel)
+                    delay = 1
+
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self.deliver(channel, json.loads(message['data']))
+
+            except (redis.RedisError, OSError):
+                logger.warning('Event listener for %s lost Redis, reconnecting in %ss', channel, delay)
+
+                # Events published meanwhile are lost, subscribers reload
+                self.deliver(channel, RESYNC)
+
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+def _put(queue, event):
+
+    if queue.full():
+        # A subscriber this far behind gets a resync instead of the backlog
+        while not queue.empty():
+            queue.get_nowait()
+
+        event = RESYNC
+
+    queue.put_nowait(event)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+
+    global _bus
+
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                if settings.EVENTS['BACKEND'] == 'redis':
+                    _bus = RedisBus(settings.EVENTS['REDIS_URL'])
+                else:
+                    _bus = MemoryBus()
+
+    return _bus
@@ -0,0 +1,158 @@
+"""
+    IP to city resolution.
+
+    Lookups go to a local MaxMind-format city database (settings.GEOIP_CITY_DB, memory-mapped),
+    with an LRU cache in front. ipinfo.io is only used as a fallback when
+    settings.GEOIP_HTTP_FALLBACK is on, through a pooled session with strict timeouts.
+"""
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from functools import lru_cache
+import threading
+import asyncio
+import logging
+import requests
+import maxminddb
+
+
+UNKNOWN_CITY = "Не определено"
+
+logger = logging.getLogger(__name__)
+
+_reader = None
+_reader_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_reader():
+
+    global _reader
+
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                try:
+                    _reader = maxminddb.open_database(str(settings.GEOIP_CITY_DB), maxminddb.MODE_MMAP)
+                except (OSError, ValueError):
+                    logger.warning('GeoIP database %s is not available', settings.GEOIP_CITY_DB)
+                    _reader = False
+
+    return _reader or None
+
+
+def get_session():
+
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=0))
+                _session = session
+
+    return _session
+
+
+def _lookup_database(ip_address):
+
+    reader = get_reader()
+
+    if reader is None:
+        return None
+
+    try:
+        record = reader.get(ip_address)
+    except ValueError:
+        # Not an IP address
+        return None
+
+    names = ((record or {}).get('city') or {}).get('names') or {}
+
+    return names.get('en') or names.get('ru')
+
+
+def _lookup_http(ip_address):
+
+    # Raises requests.RequestException on network errors and error replies (e.g. 429 when
+    # rate limited), which are not cached
+    response = get_session().get(
+        f"https://ipinfo.io/{ip_address}/json",
+        timeout=settings.GEOIP_HTTP_TIMEOUT,
+    )
+
+    if response.status_code != 200:
+        raise requests.HTTPError(f'ipinfo.io replied {response.status_code}', response=response)
+
+    return response.json().get('city') or None
+
+
+@lru_cache(maxsize=65536)
+def _resolve(ip_address):
+
+    city = _lookup_database(ip_address)
+
+    if city is None and settings.GEOIP_HTTP_FALLBACK:
+        city = _lookup_http(ip_address)
+
+    return city
+
+
+def lookup_city(ip_address):
+
+    """
+        City of the IP address, or None when it can not be resolved.
+    """
+
+    if not ip_address:
+        return None
+
+    try:
+        return _resolve(ip_address)
+    except requests.RequestException:
+        return None
+
+
+def lookup_cities(ip_addresses):
+
+    """
+        {ip: city or None} for many addresses, each distinct address is resolved once.
+    """
+
+    return {ip_address: lookup_city(ip_address) for ip_address in set(ip_addresses)}
+
+
+async def alookup_cities(ip_addresses):
+
+    """
+        Async lookup_cities. Database and cache lookups run inline, addresses that may need
+        the HTTP fallback are resolved concurrently in threads.
+    """
+
+    ip_addresses = set(ip_addresses)
+    cities = {}
+    pending = []
+
+    for ip_address in ip_addresses:
+        city = _lookup_database(ip_address) if ip_address else None
+
+        if city is not None or not settings.GEOIP_HTTP_FALLBACK:
+            cities[ip_address] = city
+        else:
+            pending.append(ip_address)
+
+    results = await asyncio.gather(*[
+        sync_to_async(lookup_city, thread_sensitive=False)(ip_address) for ip_address in pending
+    ])
+
+    cities.update(zip(pending, results))
+
+    return cities
+
+
+async def alookup_city(ip_address):
+    return (await alookup_cities([ip_address]))[ip_address]
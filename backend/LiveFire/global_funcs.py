@@ -1,32 +1,85 @@
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpRequest,  HttpResponseForbidden
+from rest_framework.utils.encoders import JSONEncoder
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest,  HttpResponseForbidden, HttpResponseNotModified, JsonResponse
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Max, Count
+from django.utils.cache import parse_etags, quote_etag
+from django.utils.dateparse import parse_datetime
 from typing import Optional
-import requests
+from functools import lru_cache
+from urllib.parse import quote
+from datetime import datetime
+from collections import OrderedDict
+import threading
+import time
+import base64
+import hashlib
+import json
 import jwt
 
+from LiveFire import geoip, profiling
+from LiveFire.metrics import serialize_timer
+
+
+def is_request_authenticated(request):
+
+    if request.method in ["GET", "POST", "PUT", "PATCH", "DELETE"]:
+
+        authenticated = False
+
+        if request.headers.get("Authorization", "").startswith("Bearer "):
+
+            auth_token = request.headers.get("Authorization")[len("Bearer "):]
+            
+            if is_token_valid(auth_token):
+
+                authenticated = True
+
+        return authenticated
+
+    return True
+
+
+async def ais_request_authenticated(request):
+
+    # Without the shared tier verification is CPU only (LRU hit or jwt.decode) and runs inline
+    if settings.JWT_SETTINGS.get('SHARED_CACHE', False):
+        return await sync_to_async(is_request_authenticated)(request)
+
+    return is_request_authenticated(request)
+
 
 def auth_required():
     def decorator(cls):
-        class AuthView(cls):
-            def dispatch(self, request, *args, **kwargs):
 
-                if request.method in ["GET", "POST", "PATCH", "DELETE"]:
+        view_name = f'{cls.__module__}.{cls.__qualname__}'
 
-                    authenticated = False
+        if getattr(cls, 'view_is_async', False):
 
-                    if request.headers.get("Authorization"):
+            class AsyncAuthView(cls):
+                async def dispatch(self, request, *args, **kwargs):
 
-                        auth_token = request.headers.get("Authorization").split("Bearer ")[1]
-                        
-                        if is_token_valid(auth_token):
+                    if not await ais_request_authenticated(request):
+                        return HttpResponseForbidden("Unauthorized")
 
-                            authenticated = True
+                    if profiling.should_profile(request):
+                        return await profiling.aprofile_dispatch(request, view_name, super().dispatch, *args, **kwargs)
 
+                    return await super().dispatch(request, *args, **kwargs)
 
-                    if not authenticated:
-                        return HttpResponseForbidden("Unauthorized")
+            return AsyncAuthView
+
+        class AuthView(cls):
+            def dispatch(self, request, *args, **kwargs):
+
+                if not is_request_authenticated(request):
+                    return HttpResponseForbidden("Unauthorized")
+
+                if profiling.should_profile(request):
+                    return profiling.profile_dispatch(request, view_name, super().dispatch, *args, **kwargs)
 
                 return super().dispatch(request, *args, **kwargs)
 
@@ -39,7 +92,8 @@ def check_fileds_in_request(request, request_type, fields):
     selected_request_type = None
 
     if request_type.lower() == "get":
-        selected_request_type = request.query_params
+        # Plain Django requests (async views) have no query_params
+        selected_request_type = getattr(request, 'query_params', request.GET)
     elif request_type.lower() in ["post", "patch", "delete"]:
         selected_request_type = request.data
 
@@ -60,33 +114,189 @@ def get_client_ip(request):
 
 
 def get_city_by_ip(ip_address):
-    url = f"https://ipinfo.io/{ip_address}/json"
-    
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
+    # Local GeoIP database with an LRU cache, see LiveFire.geoip
+    return geoip.lookup_city(ip_address) or geoip.UNKNOWN_CITY
 
-        if data.get('city'):
 
-            return data.get('city')
-        
-        return "Не определено"
-        
-    else:
-        return "Не определено"
+async def aget_city_by_ip(ip_address):
+    return await geoip.alookup_city(ip_address) or geoip.UNKNOWN_CITY
 
 
-def standard_response(data=None, message=None, status_code=status.HTTP_200_OK, errors=None):
+def get_cities_by_ips(ip_addresses):
+    return {
+        ip_address: city or geoip.UNKNOWN_CITY
+        for ip_address, city in geoip.lookup_cities(ip_addresses).items()
+    }
+
+
+@lru_cache(maxsize=65536)
+def media_url(key):
+    """
+        Public URL of a stored object, built from its key and settings.PUBLIC_MEDIA_URL
+        without going through the storage backend (no boto3 client, no signing).
+    """
+    if not key:
+        return None
+
+    return settings.PUBLIC_MEDIA_URL + quote(key)
+
+
+def standard_response(data=None, message=None, status_code=status.HTTP_200_OK, errors=None, **extra):
     response = {
         'status': 'success' if status_code < 400 else 'error',
         'message': message,
         'data': data,
         'errors': errors
     }
+    # Extra envelope keys (e.g. the 'next' cursor of paginated lists)
+    response.update(extra)
     return Response(response, status=status_code)
 
 
+def standard_json_response(data=None, message=None, status_code=status.HTTP_200_OK, errors=None, **extra):
+    """
+        standard_response for async views, which run outside of DRF.
+        Encoded like DRF responses (Decimal as float, no ASCII escaping).
+    """
+    response = {
+        'status': 'success' if status_code < 400 else 'error',
+        'message': message,
+        'data': data,
+        'errors': errors
+    }
+    response.update(extra)
+
+    with serialize_timer():
+        return JsonResponse(response, status=status_code, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+def encode_cursor(*values):
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(values, list) or len(values) != size:
+        return None
+
+    return values
+
+
+def get_page_size(request, default=50, maximum=500):
+    limit = request.GET.get('limit')
+
+    if limit is None:
+        return default
+
+    if not limit.isdigit() or int(limit) < 1:
+        return None
+
+    return min(int(limit), maximum)
+
+
+def _keyset_page_query(queryset, request, date_field, default_limit):
+    limit = get_page_size(request, default=default_limit)
+
+    if limit is None:
+        return None, None
+
+    cursor = request.GET.get('cursor')
+
+    if cursor:
+        values = decode_cursor(cursor, 2)
+
+        if values is None:
+            return None, None
+
+        last_date = parse_datetime(values[0]) if isinstance(values[0], str) else None
+        last_id = values[1]
+
+        if last_date is None or not isinstance(last_id, int):
+            return None, None
+
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__lt': last_date}) | Q(**{date_field: last_date, 'id__lt': last_id})
+        )
+
+    # One extra row tells whether there is a next page
+    return queryset.order_by(f'-{date_field}', '-id')[:limit + 1], limit
+
+
+def _keyset_page(rows, limit, date_field):
+    next_cursor = None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, date_field), last.pk)
+
+    return rows, next_cursor
+
+
+def keyset_paginate(queryset, request, date_field, default_limit=50):
+    """
+        Returns one page of the queryset ordered newest first on (date_field, id)
+        together with the cursor of the next page.
+        Returns (None, None) when the cursor or the limit is malformed.
+    """
+    query, limit = _keyset_page_query(queryset, request, date_field, default_limit)
+
+    if query is None:
+        return None, None
+
+    return _keyset_page(list(query), limit, date_field)
+
+
+async def akeyset_paginate(queryset, request, date_field, default_limit=50):
+    """
+        Async keyset_paginate.
+    """
+    query, limit = _keyset_page_query(queryset, request, date_field, default_limit)
+
+    if query is None:
+        return None, None
+
+    return _keyset_page([row async for row in query], limit, date_field)
+
+
+async def aoffset_paginate(queryset, request, default_limit=20):
+    """
+        One page of an ordered queryset for orders that keyset pagination can not follow
+        (e.g. search rank). The cursor encodes the offset.
+        Returns (None, None) when the cursor or the limit is malformed.
+    """
+    limit = get_page_size(request, default=default_limit, maximum=100)
+
+    if limit is None:
+        return None, None
+
+    offset = 0
+    cursor = request.GET.get('cursor')
+
+    if cursor:
+        values = decode_cursor(cursor, 1)
+
+        if values is None or not isinstance(values[0], int) or values[0] < 0:
+            return None, None
+
+        offset = values[0]
+
+    rows = [row async for row in queryset[offset:offset + limit + 1]]
+
+    next_cursor = None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(offset + limit)
+
+    return rows, next_cursor
+
+
 def decode_token(token):
     try:
         payload = jwt.decode(token, settings.JWT_SETTINGS["SECRET_KEY"], algorithms=[settings.JWT_SETTINGS["ALGORITHM"]])
@@ -95,11 +305,144 @@ def decode_token(token):
         return None
     except jwt.InvalidTokenError:
         return None
+
+
+# Verified tokens: sha256 digest -> payload, least recently used first
+_verified_tokens = OrderedDict()
+_verified_tokens_lock = threading.Lock()
+
+token_cache_stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _token_alive(payload):
+    # Same rule as jwt.decode without leeway: a token is expired once exp <= now
+    return payload.get('exp') is None or payload['exp'] > time.time()
+
+
+def get_token_payload(token):
+    """
+        decode_token with a bounded in-process LRU of verified tokens in front of it,
+        and optionally the shared cache (JWT_SETTINGS['SHARED_CACHE']) behind the LRU.
+        Only successfully verified tokens are cached, and `exp` is checked on every hit.
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+
+    with _verified_tokens_lock:
+        payload = _verified_tokens.get(digest)
+
+        if payload is not None:
+            if _token_alive(payload):
+                _verified_tokens.move_to_end(digest)
+                token_cache_stats['hits'] += 1
+                return payload
+
+            del _verified_tokens[digest]
+            token_cache_stats['evictions'] += 1
+
+    shared = settings.JWT_SETTINGS.get('SHARED_CACHE', False)
+    payload = None
+
+    if shared:
+        payload = cache.get(f'jwt:{digest}')
+
+        if payload is not None and not _token_alive(payload):
+            payload = None
+
+    counter = 'shared_hits' if payload is not None else 'misses'
+
+    if payload is None:
+        payload = decode_token(token)
+
+        if payload is not None and shared:
+            timeout = max(int(payload['exp'] - time.time()), 1) if payload.get('exp') is not None else None
+            cache.set(f'jwt:{digest}', payload, timeout)
+
+    with _verified_tokens_lock:
+        token_cache_stats[counter] += 1
+
+        if payload is None:
+            return None
+
+        _verified_tokens[digest] = payload
+        _verified_tokens.move_to_end(digest)
+
+        while len(_verified_tokens) > settings.JWT_SETTINGS.get('VERIFIED_CACHE_SIZE', 10000):
+            _verified_tokens.popitem(last=False)
+            token_cache_stats['evictions'] += 1
+
+    return payload
     
 
 def is_token_valid(token):
-    payload = decode_token(token)
+    payload = get_token_payload(token)
     if payload:
         if  payload.get('user_id') and payload.get('type') == 'access':
             return True
-    return False
\ No newline at end of file
+    return False
+
+
+def _list_etag_aggregates(date_fields):
+    date_fields = date_fields or ('UpdatedAt',)
+
+    aggregates = {f'max_{index}': Max(field) for index, field in enumerate(date_fields)}
+    aggregates['count'] = Count('pk')
+
+    return aggregates
+
+
+def _list_etag_value(request, values):
+    raw = '|'.join([request.get_full_path()] + [str(values[key]) for key in sorted(values)])
+
+    return 'W/' + quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def _etag_matches(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+def list_etag(queryset, request, *date_fields):
+    """
+        Builds a weak validator for a list endpoint from one aggregate query:
+        the row count and the latest value of every date field (UpdatedAt by default).
+        The request path and query string are part of it, so pages and filters differ.
+    """
+    values = queryset.order_by().aggregate(**_list_etag_aggregates(date_fields))
+
+    return _list_etag_value(request, values)
+
+
+async def alist_etag(queryset, request, *date_fields):
+    values = await queryset.order_by().aaggregate(**_list_etag_aggregates(date_fields))
+
+    return _list_etag_value(request, values)
+
+
+def conditional_list_response(request, queryset, build_response, *date_fields):
+    """
+        Answers 304 Not Modified when If-None-Match carries the current list_etag,
+        without calling build_response; otherwise calls it and tags the response.
+    """
+    etag = list_etag(queryset, request, *date_fields)
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = build_response()
+
+    response['ETag'] = etag
+    return response
+
+
+async def aconditional_list_response(request, queryset, build_response, *date_fields):
+    """
+        Async conditional_list_response, build_response is a coroutine function.
+    """
+    etag = await alist_etag(queryset, request, *date_fields)
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = await build_response()
+
+    response['ETag'] = etag
+    return response
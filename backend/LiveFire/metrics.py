@@ -0,0 +1,287 @@
+"""
+    Per-request timing and SQL instrumentation.
+
+    RequestMetricsMiddleware records, for every request, the view (URL name), number of SQL
+    queries, time spent in the database, in serialization and in total. It adds them as
+    Server-Timing headers and aggregates them into histograms served in the Prometheus text
+    format by metrics_view. Histograms live in the worker process, each worker exports its own.
+
+    Disabled unless settings.METRICS['ENABLED'], the middleware then removes itself at startup.
+"""
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, Http404
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+
+    __slots__ = ('started', 'queries', 'db_time', 'serialize_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # labels -> [count per bucket..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+
+        series = self.series.get(labels)
+
+        if series is None:
+            series = self.series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self, label_names):
+
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+
+        for labels, series in sorted(self.series.items()):
+
+            base = ','.join(f'{name}="{value}"' for name, value in zip(label_names, labels))
+
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{base}}} {series[-2]}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]:.6f}')
+
+        return lines
+
+
+LABELS = ('view', 'method')
+
+HISTOGRAMS = {
+    'total': Histogram('livefire_request_duration_seconds', 'Wall time of the request', DURATION_BUCKETS),
+    'db': Histogram('livefire_request_db_seconds', 'Time spent in SQL queries', DURATION_BUCKETS),
+    'serialize': Histogram('livefire_request_serialize_seconds', 'Time spent serializing and rendering the response', DURATION_BUCKETS),
+    'queries': Histogram('livefire_request_db_queries', 'SQL queries per request', QUERY_BUCKETS),
+}
+
+# (view, method, status) -> count
+_responses = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def serialize_timer():
+
+    """
+        Adds the time spent in the block to the current request's serialization time.
+        A no-op outside an instrumented request.
+    """
+
+    stats = _current.get()
+
+    if stats is None:
+        yield
+        return
+
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        stats.serialize_time += time.perf_counter() - started
+
+
+def _record_query(execute, sql, params, many, context):
+
+    stats = _current.get()
+
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+
+
+def _install_query_recorder(connection, **kwargs):
+
+    # Connections are per thread, so the wrapper is added to every one of them,
+    # including those of the threads sync_to_async runs ORM calls in
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _install_on_current_connections(**kwargs):
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(connection)
+
+
+def _view_name(request):
+
+    match = getattr(request, 'resolver_match', None)
+
+    return match.view_name if match is not None else 'unresolved'
+
+
+def _finish(request, response, stats):
+
+    total = time.perf_counter() - stats.started
+    labels = (_view_name(request), request.method)
+
+    with _lock:
+        HISTOGRAMS['total'].observe(labels, total)
+        HISTOGRAMS['db'].observe(labels, stats.db_time)
+        HISTOGRAMS['serialize'].observe(labels, stats.serialize_time)
+        HISTOGRAMS['queries'].observe(labels, stats.queries)
+
+        key = labels + (str(response.status_code),)
+        _responses[key] = _responses.get(key, 0) + 1
+
+    if settings.METRICS['SERVER_TIMING'] and not response.streaming:
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+            f'serialize;dur={stats.serialize_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+    return response
+
+
+class RequestMetricsMiddleware:
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+        connection_created.connect(_install_query_recorder, dispatch_uid='livefire_metrics')
+        request_started.connect(_install_on_current_connections, dispatch_uid='livefire_metrics')
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return _finish(request, response, stats)
+
+    async def __acall__(self, request):
+
+        stats = RequestStats()
+        token = _current.set(stats)
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return _finish(request, response, stats)
+
+    def process_template_response(self, request, response):
+
+        # DRF responses are rendered after the view returns, time the rendering as serialization
+        stats = _current.get()
+
+        if stats is not None:
+
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.serialize_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+
+        return response
+
+
+def _counter_lines(name, documentation, values):
+
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} counter']
+    lines += [f'{name}{{kind="{kind}"}} {value}' for kind, value in sorted(values.items())]
+
+    return lines
+
+
+def render_metrics():
+
+    from LiveFire.global_funcs import token_cache_stats
+    from Products.funcs import catalog_cache_stats
+
+    lines = []
+
+    with _lock:
+
+        for histogram in HISTOGRAMS.values():
+            lines += histogram.render(LABELS)
+
+        lines += ['# HELP livefire_responses_total Responses by view, method and status', '# TYPE livefire_responses_total counter']
+        lines += [
+            f'livefire_responses_total{{view="{view}",method="{method}",status="{status}"}} {count}'
+            for (view, method, status), count in sorted(_responses.items())
+        ]
+
+    lines += _counter_lines('livefire_token_cache_total', 'Verified JWT cache lookups', token_cache_stats)
+    lines += _counter_lines('livefire_catalog_cache_total', 'Product catalog cache lookups', catalog_cache_stats)
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+
+    """
+        Prometheus scrape endpoint. Protected by settings.METRICS['TOKEN'] (Bearer) when it is set.
+    """
+
+    if not settings.METRICS['ENABLED']:
+        raise Http404()
+
+    token = settings.METRICS['TOKEN']
+
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Unauthorized', status=403)
+
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,202 @@
+"""
+    On-demand profiling of single requests.
+
+    auth_required runs a view's dispatch under cProfile when settings.PROFILING['ENABLED'] and either
+    the request carries the X-Profile header and its token belongs to a user in
+    PROFILING['ADMIN_USER_IDS'], or the request is picked by PROFILING['SAMPLE_RATE'].
+    The profile (<id>.prof, readable with pstats or snakeviz) and <id>.json with the request
+    metadata, the executed SQL and the top functions are written to PROFILING['DIRECTORY'];
+    the id is returned in the X-Profile-Id response header.
+
+    Async views are profiled on the event loop thread and on the thread their ORM calls run in,
+    the loop profile also contains whatever other requests did on the loop meanwhile.
+    Both threads are shared, so only one async request per process is profiled at a time,
+    async requests picked while another one is being profiled are not profiled.
+"""
+
+from django.conf import settings
+from django.db import connection
+from asgiref.sync import sync_to_async
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+import cProfile
+import pstats
+import random
+import threading
+import uuid
+import json
+import time
+import io
+
+
+PROFILE_HEADER = 'X-Profile'
+TOP_FUNCTIONS = 30
+
+# Held while an async request is profiled on the shared event loop and sync threads
+_shared_threads_lock = threading.Lock()
+
+
+def _requested_by_admin(request):
+
+    from LiveFire.global_funcs import get_token_payload
+
+    authorization = request.headers.get('Authorization', '')
+
+    if not authorization.startswith('Bearer '):
+        return False
+
+    payload = get_token_payload(authorization[len('Bearer '):])
+
+    return payload is not None and payload.get('user_id') in settings.PROFILING['ADMIN_USER_IDS']
+
+
+def should_profile(request):
+
+    config = settings.PROFILING
+
+    if not config['ENABLED']:
+        return False
+
+    if PROFILE_HEADER in request.headers and _requested_by_admin(request):
+        return True
+
+    return config['SAMPLE_RATE'] > 0 and random.random() < config['SAMPLE_RATE']
+
+
+class RequestProfile:
+
+    """
+        A cProfile profiler plus the SQL executed, for the thread it was started in.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.stack = None
+
+    def capture_query(self, execute, sql, params, many, context):
+
+        started = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < settings.PROFILING['MAX_QUERIES']:
+                self.queries.append({
+                    'sql': sql,
+                    'params': repr(params)[:1000],
+                    'many': many,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                })
+
+    def start(self):
+        self.stack = ExitStack()
+        self.stack.enter_context(connection.execute_wrapper(self.capture_query))
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.stack.close()
+
+
+def _write(request, view_name, profiles, response, started, wall_time):
+
+    directory = Path(settings.PROFILING['DIRECTORY'])
+    directory.mkdir(parents=True, exist_ok=True)
+
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    stats = pstats.Stats(profiles[0].profiler)
+
+    for profile in profiles[1:]:
+        stats.add(profile.profiler)
+
+    stats.dump_stats(str(directory / f'{profile_id}.prof'))
+
+    top = io.StringIO()
+    pstats.Stats(str(directory / f'{profile_id}.prof'), stream=top).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+    queries = [query for profile in profiles for query in profile.queries]
+
+    metadata = {
+        'id': profile_id,
+        'started_at': started.isoformat(),
+        'view': view_name,
+        'url_name': getattr(request.resolver_match, 'view_name', None),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status_code': response.status_code,
+        'wall_time_ms': round(wall_time * 1000, 3),
+        'sampled': PROFILE_HEADER not in request.headers,
+        'sql_count': len(queries),
+        'sql_time_ms': round(sum(query['duration_ms'] for query in queries), 3),
+        'sql': queries,
+        'top_functions': top.getvalue(),
+    }
+
+    with open(directory / f'{profile_id}.json', 'w') as file:
+        json.dump(metadata, file, indent=2, ensure_ascii=False)
+
+    return profile_id
+
+
+def profile_dispatch(request, view_name, dispatch, *args, **kwargs):
+
+    profile = RequestProfile()
+    started = datetime.now()
+    timer = time.perf_counter()
+
+    profile.start()
+
+    try:
+        response = dispatch(request, *args, **kwargs)
+
+        # DRF responses are rendered lazily, rendering is part of the cost being profiled
+        if hasattr(response, 'render'):
+            response.render()
+    finally:
+        profile.stop()
+
+    response[f'{PROFILE_HEADER}-Id'] = _write(request, view_name, [profile], response, started, time.perf_counter() - timer)
+
+    return response
+
+
+async def aprofile_dispatch(request, view_name, dispatch, *args, **kwargs):
+
+    # cProfile allows one active profiler per thread
+    if not _shared_threads_lock.acquire(blocking=False):
+        return await dispatch(request, *args, **kwargs)
+
+    try:
+        return await _aprofile_dispatch(request, view_name, dispatch, *args, **kwargs)
+    finally:
+        _shared_threads_lock.release()
+
+
+async def _aprofile_dispatch(request, view_name, dispatch, *args, **kwargs):
+
+    loop_profile = RequestProfile()
+    # Started in the thread the request's sync_to_async calls (ORM) run in
+    thread_profile = RequestProfile()
+
+    started = datetime.now()
+    timer = time.perf_counter()
+
+    await sync_to_async(thread_profile.start)()
+    loop_profile.profiler.enable()
+
+    try:
+        response = await dispatch(request, *args, **kwargs)
+    finally:
+        loop_profile.profiler.disable()
+        await sync_to_async(thread_profile.stop)()
+
+    wall_time = time.perf_counter() - timer
+
+    response[f'{PROFILE_HEADER}-Id'] = await sync_to_async(_write, thread_sensitive=False)(
+        request, view_name, [loop_profile, thread_profile], response, started, wall_time
+    )
+
+    return response
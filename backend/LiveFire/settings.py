@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+from celery.schedules import crontab
 
 load_dotenv()
 
@@ -42,10 +43,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'corsheaders',
     'storages',
+    'django_celery_results',
+    'django_celery_beat',
 
 
     'Auth',
@@ -53,9 +57,13 @@ INSTALLED_APPS = [
     'Orders',
     'Customers',
     'Dashboard',
+    'Sync',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole stack; removes itself when METRICS['ENABLED'] is off
+    'LiveFire.metrics.RequestMetricsMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -104,6 +112,22 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv("REDIS_URL", "redis://redis:6379/0"),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # A Redis outage degrades to cache misses instead of failing requests
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -151,6 +175,10 @@ JWT_SETTINGS = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=10), # Temporary for development
     'ALGORITHM': 'HS256',
     'SECRET_KEY': SECRET_KEY,
+    # Verified tokens kept in each process (LiveFire.global_funcs.get_token_payload)
+    'VERIFIED_CACHE_SIZE': 10000,
+    # Also share verified tokens between processes through the default cache
+    'SHARED_CACHE': False,
 }
 
 
@@ -158,13 +186,99 @@ AWS_ACCESS_KEY_ID = os.environ.get("MINIO_ROOT_USER")
 AWS_SECRET_ACCESS_KEY = os.environ.get("MINIO_ROOT_PASSWORD")
 AWS_STORAGE_BUCKET_NAME = 'live-fire-main-bucket'
 AWS_S3_ENDPOINT_URL = 'http://minio:9000' 
+# MinIO as reachable from browsers, presigned uploads are signed for this host
+AWS_S3_PUBLIC_ENDPOINT_URL = os.getenv("MINIO_PUBLIC_ENDPOINT_URL", "http://localhost:9000")
 AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',
 }
 AWS_LOCATION = 'live-fire-main-bucket'
+# Objects are served from a public-read bucket, URLs are not signed
+AWS_QUERYSTRING_AUTH = False
+
+# Prefix of public object URLs built by global_funcs.media_url, the object key is appended to it.
+# Relative by default, the frontend prepends the MinIO host
+PUBLIC_MEDIA_URL = os.getenv("PUBLIC_MEDIA_URL", f"/{AWS_STORAGE_BUCKET_NAME}/{AWS_LOCATION}/")
 
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+PRODUCT_IMAGE_MAX_SIZE = 20 * 1024 * 1024
+
 
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+
+
+# IP geolocation (LiveFire.geoip)
+# MaxMind-format city database, e.g. GeoLite2-City.mmdb
+
+GEOIP_CITY_DB = os.getenv("GEOIP_CITY_DB", str(BASE_DIR / 'geoip' / 'GeoLite2-City.mmdb'))
+GEOIP_HTTP_FALLBACK = os.getenv("GEOIP_HTTP_FALLBACK", "false").lower() == "true"
+GEOIP_HTTP_TIMEOUT = (1, 2)  # connect, read
+
+
+
+# Request metrics (LiveFire.metrics): Server-Timing headers and a Prometheus endpoint at /metrics/
+
+METRICS = {
+    'ENABLED': os.getenv("METRICS_ENABLED", "false").lower() == "true",
+    'SERVER_TIMING': True,
+    # Bearer token required by /metrics/, open when empty
+    'TOKEN': os.getenv("METRICS_TOKEN", ""),
+}
+
+
+
+# On-demand request profiling (LiveFire.profiling)
+
+PROFILING = {
+    'ENABLED': os.getenv("PROFILING_ENABLED", "false").lower() == "true",
+    # Users whose requests are profiled when they send the X-Profile header
+    'ADMIN_USER_IDS': [int(user_id) for user_id in os.getenv("PROFILING_ADMIN_USER_IDS", "").split(',') if user_id.strip()],
+    # Share of all authenticated requests profiled at random, 0.001 = one in a thousand
+    'SAMPLE_RATE': float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+    'DIRECTORY': os.getenv("PROFILING_DIRECTORY", str(BASE_DIR / 'profiles')),
+    'MAX_QUERIES': 1000,
+}
+
+
+
+# Server-pushed events (LiveFire.events), e.g. order updates for packing screens
+# 'memory' only reaches clients connected to the same process, use 'redis' with several workers
+
+EVENTS = {
+    'BACKEND': os.getenv("EVENTS_BACKEND", "memory"),
+    'REDIS_URL': os.getenv("REDIS_URL", "redis://redis:6379/0"),
+}
+
+
+
+# Background tasks (LiveFire.celery)
+# Without a broker tasks run eagerly in the calling process, e.g. in tests; TASKS_EAGER=true forces it
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "")
+CELERY_TASK_ALWAYS_EAGER = os.getenv("TASKS_EAGER", "false").lower() == "true" or not CELERY_BROKER_URL
+
+CELERY_RESULT_BACKEND = 'django-db'
+# Only the scheduled jobs keep their results, see the tasks with ignore_result=False
+CELERY_TASK_IGNORE_RESULT = True
+
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TIMEZONE = TIME_ZONE
+
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'prune-tombstones': {
+        'task': 'Sync.tasks.prune_tombstones',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'reconcile-customer-totals': {
+        'task': 'Customers.tasks.reconcile_customer_totals',
+        'schedule': crontab(hour=3, minute=15),
+    },
+    'rebuild-daily-profits': {
+        'task': 'Dashboard.tasks.rebuild_daily_profits',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
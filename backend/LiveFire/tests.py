@@ -0,0 +1,173 @@
+from django.core.cache import cache
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from asgiref.sync import async_to_sync
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from datetime import date
+from unittest import mock
+import requests
+import json
+
+from Auth.funcs import generate_token
+from Customers.models import Customers
+from Customers.serializers import CustomersSerializer
+from Dashboard.funcs import get_dashboard
+from Orders.funcs import create_order, orders_by_type
+from Orders.serializers import OrdersSerializer
+from Products.funcs import get_catalog
+from Products.models import Products
+from LiveFire import geoip
+from LiveFire.global_funcs import keyset_paginate, list_etag, standard_response
+
+
+def reader(cities):
+
+    def get(ip_address):
+        if ip_address == 'not-an-ip':
+            raise ValueError(ip_address)
+
+        return {'city': {'names': {'en': cities[ip_address]}}} if ip_address in cities else None
+
+    return mock.Mock(get=mock.Mock(side_effect=get))
+
+
+def reply(status_code, city=None):
+    return mock.Mock(status_code=status_code, json=mock.Mock(return_value={'city': city}))
+
+
+class GeoIPTests(SimpleTestCase):
+
+    def setUp(self):
+        geoip._resolve.cache_clear()
+        self.addCleanup(geoip._resolve.cache_clear)
+
+        self.reader = reader({'1.1.1.1': 'Moscow', '2.2.2.2': 'Kazan'})
+        self.session = mock.Mock()
+
+        for name, value in [('get_reader', self.reader), ('get_session', self.session)]:
+            patcher = mock.patch(f'LiveFire.geoip.{name}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_database_lookup(self):
+        self.assertEqual(geoip.lookup_city('1.1.1.1'), 'Moscow')
+        self.assertEqual(geoip.lookup_city('1.1.1.1'), 'Moscow')
+
+        self.assertIsNone(geoip.lookup_city('3.3.3.3'))
+        self.assertIsNone(geoip.lookup_city('not-an-ip'))
+        self.assertIsNone(geoip.lookup_city(None))
+
+        self.assertEqual(self.reader.get.call_count, 3)
+        self.session.get.assert_not_called()
+
+    def test_database_missing(self):
+        with mock.patch('LiveFire.geoip.get_reader', return_value=None):
+            self.assertIsNone(geoip.lookup_city('1.1.1.1'))
+
+    def test_lookup_cities(self):
+        self.assertEqual(
+            geoip.lookup_cities(['1.1.1.1', '2.2.2.2', '1.1.1.1', '3.3.3.3']),
+            {'1.1.1.1': 'Moscow', '2.2.2.2': 'Kazan', '3.3.3.3': None},
+        )
+        self.assertEqual(self.reader.get.call_count, 3)
+
+    @override_settings(GEOIP_HTTP_FALLBACK=True)
+    def test_http_fallback(self):
+        self.session.get.return_value = reply(200, 'Paris')
+
+        self.assertEqual(geoip.lookup_city('1.1.1.1'), 'Moscow')
+        self.assertEqual(geoip.lookup_city('3.3.3.3'), 'Paris')
+        self.assertEqual(geoip.lookup_city('3.3.3.3'), 'Paris')
+
+        self.session.get.assert_called_once()
+        self.assertEqual(self.session.get.call_args.args, ('https://ipinfo.io/3.3.3.3/json',))
+
+    @override_settings(GEOIP_HTTP_FALLBACK=True)
+    def test_failed_fallback_is_not_cached(self):
+        self.session.get.side_effect = [reply(429), requests.ConnectionError(), reply(200, 'Paris')]
+
+        self.assertIsNone(geoip.lookup_city('3.3.3.3'))
+        self.assertIsNone(geoip.lookup_city('3.3.3.3'))
+        self.assertEqual(geoip.lookup_city('3.3.3.3'), 'Paris')
+
+    @override_settings(GEOIP_HTTP_FALLBACK=True)
+    def test_alookup_cities(self):
+        self.session.get.side_effect = lambda url, timeout: reply(200, 'Paris') if '3.3.3.3' in url else reply(404)
+
+        self.assertEqual(
+            async_to_sync(geoip.alookup_cities)(['1.1.1.1', '3.3.3.3', '4.4.4.4', '3.3.3.3', None]),
+            {'1.1.1.1': 'Moscow', '3.3.3.3': 'Paris', '4.4.4.4': None, None: None},
+        )
+        self.assertEqual(self.session.get.call_count, 2)
+
+        self.assertEqual(async_to_sync(geoip.alookup_city)('2.2.2.2'), 'Kazan')
+
+
+class AsyncListViewsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.candle = Products.objects.create(Name='Candle', Price=10, Costs=4, Image='products/a.jpg', InStock=10)
+
+        for name in ['Anna', 'Boris', 'Vera']:
+            create_order(Customers.objects.create(Name=name).pk, date.today(), {cls.candle.pk: 1})
+
+    def setUp(self):
+        cache.clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def rendered(self, **kwargs):
+        # What the DRF views returned before they were made async
+        return json.loads(JSONRenderer().render(standard_response(**kwargs).data))
+
+    def test_products(self):
+        response = self.client.get('/api/v1/products/get_products/')
+
+        self.assertEqual(response.json(), self.rendered(data={'products': get_catalog()}))
+
+    def test_customers(self):
+        response = self.client.get('/api/v1/customers/get_customers/')
+
+        self.assertEqual(response.json(), self.rendered(data=CustomersSerializer(Customers.objects.all(), many=True).data))
+
+    def test_orders_pages(self):
+        orders = orders_by_type('all').annotate(CustomerName=F('Customer__Name'))
+        params = {'type': 'all', 'limit': 2}
+        pages = 0
+
+        while params:
+            request = RequestFactory().get('/api/v1/orders/get_orders/', params)
+            page, next_cursor = keyset_paginate(orders, request, 'OrderDate')
+
+            response = self.client.get('/api/v1/orders/get_orders/', params)
+
+            self.assertEqual(response.json(), self.rendered(data=OrdersSerializer(page, many=True).data, next=next_cursor))
+            self.assertEqual(response['ETag'], list_etag(orders, request, 'UpdatedAt', 'Customer__UpdatedAt'))
+
+            params = dict(params, cursor=next_cursor) if next_cursor else None
+            pages += 1
+
+        self.assertEqual(pages, 2)
+
+    def test_dashboard(self):
+        response = self.client.get('/api/v1/dashboard/main_dashboard/')
+
+        self.assertEqual(response.json(), json.loads(json.dumps(get_dashboard(), cls=JSONEncoder)))
+
+    def test_not_modified(self):
+        for path in ['/api/v1/products/get_products/', '/api/v1/customers/get_customers/', '/api/v1/orders/get_orders/?type=all']:
+            with self.subTest(path=path):
+                etag = self.client.get(path)['ETag']
+
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+                # Any write to a listed row changes the validator
+                for row in [*Customers.objects.all(), *Products.objects.all()]:
+                    row.save()
+
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
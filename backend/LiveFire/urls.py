@@ -16,10 +16,15 @@ Including another URLconf
 """
 from django.urls import path, include
 
+from LiveFire.metrics import metrics_view
+
 urlpatterns = [
     path('api/v1/auth/', include('Auth.urls')),
     path('api/v1/orders/', include('Orders.urls')),
     path('api/v1/products/', include('Products.urls')),
     path('api/v1/customers/', include('Customers.urls')),
     path('api/v1/dashboard/', include('Dashboard.urls')),
+    path('api/v1/sync/', include('Sync.urls')),
+
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+    Order events pushed to packing screens over server-sent events.
+
+    OrderView.post/put/delete and the import publish order.created, order.status_changed and
+    order.cancelled once their transaction commits. order_events_app streams them at
+    ORDER_EVENTS_PATH; it is a plain ASGI app mounted in LiveFire/asgi.py, so it notices client
+    disconnects and holds no worker thread per connection. Not available under WSGI.
+"""
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F
+import asyncio
+import json
+import io
+
+from Orders.models import Orders
+from Orders.serializers import OrdersSerializer
+
+from LiveFire.events import get_bus
+from LiveFire.global_funcs import ais_request_authenticated
+
+
+ORDER_EVENTS_PATH = '/api/v1/orders/events/'
+ORDER_EVENTS_CHANNEL = 'orders:events'
+
+HEARTBEAT = 15
+
+
+def publish_order_events(event_type, orders, previous_status=None):
+
+    """
+        Publishes `event_type` for every order after the current transaction commits,
+        with the order serialized like an OrdersView row.
+    """
+
+    ids = [Order.pk for Order in orders]
+
+    if ids:
+        transaction.on_commit(lambda: _publish(event_type, ids, previous_status))
+
+
+def publish_status_change(Order, previous_status):
+
+    if Order.OrderStatus == Orders.OrderStatusChoices.CANCELLED:
+        publish_order_events('order.cancelled', [Order], previous_status)
+    else:
+        publish_order_events('order.status_changed', [Order], previous_status)
+
+
+def _publish(event_type, ids, previous_status):
+
+    rows = Orders.objects.filter(pk__in=ids).annotate(CustomerName=F('Customer__Name')).only(
+        'id', 'DueDate', 'OrderStatus', 'OrderTotal'
+    ).order_by('id')
+
+    bus = get_bus()
+
+    for row in rows:
+        bus.publish(ORDER_EVENTS_CHANNEL, {
+            'type': event_type,
+            'order': OrdersSerializer(row).data,
+            'previous_status': previous_status,
+        })
+
+
+def _cors_headers():
+
+    if settings.CORS_ALLOW_ALL_ORIGINS:
+        return [(b'access-control-allow-origin', b'*')]
+
+    return []
+
+
+async def _respond(send, status_code, body=b'', headers=()):
+    await send({'type': 'http.response.start', 'status': status_code, 'headers': _cors_headers() + list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _format(event_id, event):
+    return f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode()
+
+
+async def order_events_app(scope, receive, send):
+
+    request = ASGIRequest(scope, io.BytesIO())
+
+    if request.method == 'OPTIONS':
+        # CORS preflight, the Authorization header makes the request non-simple
+        return await _respond(send, 200, headers=[
+            (b'access-control-allow-methods', b'GET, OPTIONS'),
+            (b'access-control-allow-headers', b'authorization'),
+        ])
+
+    if request.method != 'GET':
+        return await _respond(send, 405, b'Method not allowed')
+
+    if not await ais_request_authenticated(request):
+        return await _respond(send, 403, b'Unauthorized')
+
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+
+    try:
+        async with get_bus().subscribe(ORDER_EVENTS_CHANNEL) as queue:
+
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': _cors_headers() + [
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    # Tells nginx not to buffer the stream
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+
+            event_id = 0
+
+            while not disconnected.done():
+
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, disconnected}, timeout=HEARTBEAT, return_when=asyncio.FIRST_COMPLETED)
+
+                if getter in done:
+                    event_id += 1
+                    await send({'type': 'http.response.body', 'body': _format(event_id, getter.result()), 'more_body': True})
+                    continue
+
+                getter.cancel()
+
+                if not disconnected.done():
+                    # Keeps proxies from closing an idle connection
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+
+    finally:
+        disconnected.cancel()
@@ -3,10 +3,16 @@
 import json
 from django import forms
 from django.core.exceptions import ValidationError
+from Orders.models import Orders
 from Products.models import Products
 from Customers.models import Customers
 
-class CartForm(forms.Form):
+class CartLineForm(forms.Form):
+    """
+        Validates the shape of a cart without touching the database.
+        cleaned_data['cart_data'] is normalized to {product_id (int): quantity}.
+    """
+
     cart_data = forms.JSONField(required=True)
 
     customer_id = forms.IntegerField(required=True)
@@ -20,15 +26,14 @@ class CartForm(forms.Form):
         if not isinstance(data, dict):
             raise forms.ValidationError("Expected JSON object (dictionary).")
 
+        cart = {}
+
         for key, value in data.items():
             # Проверяем, что ключ можно привести к int
             try:
-                int(key)
+                product_id = int(key)
             except ValueError:
                 raise forms.ValidationError(f"Key '{key}' is not an integer (product ID).")
-            
-            if not Products.objects.filter(pk=key).exists():
-                raise forms.ValidationError(f"Product with id={key} not found in the database.")
 
             # Проверим, что количество — целое положительное
             if not isinstance(value, int) or value < 1:
@@ -36,7 +41,25 @@ class CartForm(forms.Form):
                     f"Quantity for product '{key}' must be an integer > 0."
                 )
 
-        return data
+            cart[product_id] = cart.get(product_id, 0) + value
+
+        return cart
+
+
+class CartForm(CartLineForm):
+
+    def clean_cart_data(self):
+
+        cart = super().clean_cart_data()
+
+        # Все товары проверяются одним запросом
+        existing = set(Products.objects.filter(pk__in=cart.keys()).values_list('pk', flat=True))
+
+        for product_id in cart:
+            if product_id not in existing:
+                raise forms.ValidationError(f"Product with id={product_id} not found in the database.")
+
+        return cart
     
 
     def clean_customer_id(self):
@@ -48,3 +71,21 @@ class CartForm(forms.Form):
 
         return customer_id
 
+
+class OrderExportForm(forms.Form):
+    """
+        Filters of the order export; dates are inclusive and match OrderDate.
+    """
+
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], required=False)
+    status = forms.MultipleChoiceField(choices=Orders.OrderStatusChoices.choices, required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        if cleaned_data.get('date_from') and cleaned_data.get('date_to') and cleaned_data['date_from'] > cleaned_data['date_to']:
+            raise forms.ValidationError("date_from is after date_to.")
+
+        return cleaned_data
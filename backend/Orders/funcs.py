@@ -0,0 +1,451 @@
+from django.db import transaction
+from django.db.models import Case, When, F, Q
+from django.db.models.functions import Now
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from datetime import datetime, time, timedelta
+import json
+import csv
+import io
+
+from Orders.models import Orders, OrderItems
+from Orders.forms import CartLineForm
+from Products.models import Products
+from Products.funcs import invalidate_catalog
+from Dashboard.funcs import add_orders_to_rollup, move_order_in_rollup
+from Customers.funcs import update_customer_totals
+from Customers.models import Customers
+from Orders.events import publish_order_events, publish_status_change
+from Sync.funcs import mark_read_only
+
+
+IMPORT_CHUNK_SIZE = 500
+
+# Rows fetched per server-side cursor round trip and written per response chunk
+EXPORT_CHUNK_SIZE = 2000
+
+# (column, OrderItems lookup) of every export line, one line per order item
+EXPORT_COLUMNS = [
+    ('order_id', 'Order_id'),
+    ('order_date', 'Order__OrderDate'),
+    ('due_date', 'Order__DueDate'),
+    ('status', 'Order__OrderStatus'),
+    ('order_total', 'Order__OrderTotal'),
+    ('order_costs', 'Order__OrderCosts'),
+    ('customer_id', 'Order__Customer_id'),
+    ('customer_name', 'Order__Customer__Name'),
+    ('customer_email', 'Order__Customer__Email'),
+    ('customer_phone', 'Order__Customer__Phone'),
+    ('item_id', 'id'),
+    ('product_id', 'Product_id'),
+    ('product_name', 'Product__Name'),
+    ('quantity', 'Quantity'),
+    ('line_total', 'Price'),
+]
+
+# OrdersView ?type= filters, each one is served by an index in Orders.models.Orders.Meta
+ORDER_LIST_FILTERS = {
+    'all': ~Q(OrderStatus=Orders.OrderStatusChoices.CANCELLED),
+    'active': Q(OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS),
+    'packed': Q(OrderStatus=Orders.OrderStatusChoices.PACKED),
+    'completed': Q(OrderStatus=Orders.OrderStatusChoices.COMPLETED),
+    'cancelled': Q(OrderStatus=Orders.OrderStatusChoices.CANCELLED),
+}
+
+
+def orders_by_type(order_type):
+
+    """
+        Orders of an OrdersView list type, None for an unknown type.
+    """
+
+    if order_type not in ORDER_LIST_FILTERS:
+        return None
+
+    return Orders.objects.filter(ORDER_LIST_FILTERS[order_type])
+
+
+def create_order(customer_id, due_date, cart):
+
+    """
+        Creates an order with its items in one transaction.
+        `cart` maps product ids to quantities. Raises Products.DoesNotExist, and creates nothing,
+        when a product was deleted after the cart was validated.
+        Products are locked in primary key order, so concurrent checkouts touching
+        the same products cannot deadlock or overwrite each other's stock updates.
+    """
+
+    with transaction.atomic():
+
+        products = list(
+            Products.objects.select_for_update().filter(pk__in=cart.keys()).order_by('pk').only('id', 'Price', 'Costs')
+        )
+
+        if len(products) != len(cart):
+            missing = sorted(set(cart) - {product.pk for product in products})
+            raise Products.DoesNotExist(f"Products not found: {missing}")
+
+        total_price = 0
+        total_costs = 0
+
+        for product in products:
+            total_price += product.Price * cart[product.pk]
+            total_costs += product.Costs * cart[product.pk]
+
+        Order = Orders.objects.create(
+            Customer_id=customer_id,
+            DueDate=due_date,
+            OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
+            OrderTotal=total_price,
+            OrderCosts=total_costs,
+        )
+
+        OrderItems.objects.bulk_create([
+            OrderItems(
+                Order=Order,
+                Product=product,
+                Quantity=cart[product.pk],
+                Price=product.Price * cart[product.pk],
+            )
+            for product in products
+        ])
+
+        adjust_stock({product_id: -quantity for product_id, quantity in cart.items()})
+
+        add_orders_to_rollup([Order])
+        update_customer_totals([Order])
+
+        publish_order_events('order.created', [Order])
+
+    return Order
+
+
+def track_status_change(Order, previous_status):
+
+    """
+        Updates everything derived from an order's status after it was saved:
+        the dashboard rollup and the customer's totals, and notifies packing screens.
+        Must run in the transaction that changed the order.
+    """
+
+    if previous_status == Order.OrderStatus:
+        return
+
+    move_order_in_rollup(Order, previous_status)
+    update_customer_totals([Order], previous_status)
+
+    publish_status_change(Order, previous_status)
+
+
+def cancel_order(Order):
+
+    """
+        Cancels an order locked with select_for_update and returns its items to stock.
+        The products are locked in primary key order before the stock UPDATE, like in
+        create_order, so a cancel cannot deadlock with a checkout of the same products.
+    """
+
+    returned = {}
+
+    for product_id, quantity in Order.OrderItems.exclude(Product=None).values_list('Product_id', 'Quantity'):
+        returned[product_id] = returned.get(product_id, 0) + quantity
+
+    # Evaluated only for the row locks
+    list(Products.objects.select_for_update().filter(pk__in=returned.keys()).order_by('pk').values_list('pk', flat=True))
+
+    adjust_stock(returned)
+
+    previous_status = Order.OrderStatus
+
+    Order.OrderStatus = Orders.OrderStatusChoices.CANCELLED
+    Order.save(update_fields=['OrderStatus', 'UpdatedAt'])
+
+    track_status_change(Order, previous_status)
+
+
+def adjust_stock(deltas):
+
+    """
+        Adds a delta to InStock of every product in `deltas` (product id -> delta)
+        with a single UPDATE, relative to the current value in the database.
+        Callers lock the products in primary key order first, the UPDATE locks them in scan order.
+        The cached catalog is invalidated once the surrounding transaction commits.
+    """
+
+    if not deltas:
+        return
+
+    # update() bypasses auto_now, UpdatedAt is set explicitly for list validators
+    Products.objects.filter(pk__in=deltas.keys()).update(
+        UpdatedAt=Now(),
+        InStock=Case(
+            *[When(pk=product_id, then=F('InStock') + delta) for product_id, delta in deltas.items()],
+            default=F('InStock'),
+        )
+    )
+
+    transaction.on_commit(invalidate_catalog)
+
+
+def import_orders(lines, chunk_size=IMPORT_CHUNK_SIZE):
+
+    """
+        Creates orders from NDJSON lines, each shaped like the create_order request:
+        {"customer_id": ..., "due_date": "YYYY-MM-DD", "cart_data": {product_id: quantity}}.
+        Customers and products are checked against id sets loaded once, the valid orders of
+        every `chunk_size` non-empty lines are written in one transaction.
+        Yields one result dict per non-empty line, in line order, a chunk's results once it
+        is committed.
+
+        Lines are read and written while the results are consumed. If the consumer stops
+        (the client disconnects) the import stops: every chunk whose results were yielded is
+        committed, the lines after it are not imported. Only the chunk being written at that
+        moment can be committed without its results having reached the client; resume after
+        the last line with a result and check that chunk's orders first.
+    """
+
+    customer_ids = set(Customers.objects.values_list('pk', flat=True))
+    product_ids = set(Products.objects.values_list('pk', flat=True))
+
+    chunk = []
+    errors = []
+
+    for line_number, line in enumerate(lines, start=1):
+
+        line = line.strip()
+
+        if not line:
+            continue
+
+        cleaned_data, error = _parse_import_line(line, customer_ids, product_ids)
+
+        if error:
+            errors.append({'line': line_number, 'status': 'error', 'errors': error})
+        else:
+            chunk.append((line_number, cleaned_data))
+
+        if len(chunk) + len(errors) >= chunk_size:
+            yield from _chunk_results(chunk, errors)
+            chunk = []
+            errors = []
+
+    if chunk or errors:
+        yield from _chunk_results(chunk, errors)
+
+
+def _parse_import_line(line, customer_ids, product_ids):
+
+    """
+        (cleaned CartLineForm data, None) for a valid import line, (None, error) otherwise.
+    """
+
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None, 'Invalid JSON'
+
+    if not isinstance(data, dict):
+        return None, 'Expected JSON object'
+
+    form = CartLineForm(data)
+
+    if not form.is_valid():
+        return None, form.errors
+
+    if form.cleaned_data['customer_id'] not in customer_ids:
+        return None, f"Customer with id={form.cleaned_data['customer_id']} not found"
+
+    missing = [product_id for product_id in form.cleaned_data['cart_data'] if product_id not in product_ids]
+
+    if missing:
+        return None, f"Products not found: {missing}"
+
+    return form.cleaned_data, None
+
+
+def _chunk_results(chunk, errors):
+
+    results = errors + (_write_orders_chunk(chunk) if chunk else [])
+
+    return sorted(results, key=lambda result: result['line'])
+
+
+def _write_orders_chunk(chunk):
+
+    results = []
+
+    with transaction.atomic():
+
+        ids = set()
+
+        for _, cleaned_data in chunk:
+            ids.update(cleaned_data['cart_data'].keys())
+
+        # Locked in primary key order, like create_order; prices are read under the lock
+        prices = {
+            pk: (price, costs)
+            for pk, price, costs in Products.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'Price', 'Costs')
+        }
+
+        created = []
+
+        for line_number, cleaned_data in chunk:
+
+            cart = cleaned_data['cart_data']
+
+            if any(product_id not in prices for product_id in cart):
+                # Deleted after the id set was loaded
+                results.append({'line': line_number, 'status': 'error', 'errors': 'Product not found'})
+                continue
+
+            Order = Orders(
+                Customer_id=cleaned_data['customer_id'],
+                DueDate=cleaned_data['due_date'],
+                OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
+                OrderTotal=sum(prices[product_id][0] * quantity for product_id, quantity in cart.items()),
+                OrderCosts=sum(prices[product_id][1] * quantity for product_id, quantity in cart.items()),
+            )
+            created.append((line_number, Order, cart))
+
+        Orders.objects.bulk_create([Order for _, Order, _ in created])
+
+        items = []
+        deltas = {}
+
+        for line_number, Order, cart in created:
+            for product_id, quantity in cart.items():
+                items.append(OrderItems(
+                    Order=Order,
+                    Product_id=product_id,
+                    Quantity=quantity,
+                    Price=prices[product_id][0] * quantity,
+                ))
+                deltas[product_id] = deltas.get(product_id, 0) - quantity
+
+            results.append({'line': line_number, 'status': 'created', 'order_id': Order.pk})
+
+        OrderItems.objects.bulk_create(items)
+
+        adjust_stock(deltas)
+
+        add_orders_to_rollup([Order for _, Order, _ in created])
+        update_customer_totals([Order for _, Order, _ in created])
+
+        publish_order_events('order.created', [Order for _, Order, _ in created])
+
+    return results
+
+
+def export_order_lines(statuses=None, date_from=None, date_to=None):
+
+    """
+        Order items joined with their order, customer and product as EXPORT_COLUMNS tuples,
+        in (order, item) order. `date_from` and `date_to` are inclusive days of OrderDate.
+    """
+
+    items = OrderItems.objects.all()
+
+    if statuses:
+        items = items.filter(Order__OrderStatus__in=statuses)
+
+    # Bounds on the column itself, not on OrderDate::date, so the filter can use an index
+    if date_from:
+        items = items.filter(Order__OrderDate__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+
+    if date_to:
+        items = items.filter(Order__OrderDate__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+
+    return items.order_by('Order_id', 'id').values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+
+
+def _export_value(value):
+
+    if value is None or isinstance(value, (int, str)):
+        return value
+
+    # Dates as ISO 8601, decimals as exact strings
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def iter_export(lines, export_format):
+
+    """
+        Encodes export_order_lines as CSV or NDJSON, one bytes chunk per EXPORT_CHUNK_SIZE lines.
+        Rows are read through a server-side cursor, so memory use does not grow with the export.
+    """
+
+    columns = [column for column, _ in EXPORT_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def write(row):
+        if export_format == 'csv':
+            writer.writerow(['' if value is None else value for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+
+    def flush():
+        chunk = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    if export_format == 'csv':
+        # BOM, Excel reads the file as UTF-8 instead of the local code page
+        buffer.write('\ufeff')
+        write(columns)
+
+        # The header goes out before the query runs
+        yield flush()
+
+    # Inside a transaction PostgreSQL cursors are not WITH HOLD, which would make
+    # the whole result be materialized before the first row is returned
+    with transaction.atomic():
+
+        # Open for the whole download, it must not hold back delta sync tokens meanwhile
+        mark_read_only()
+
+        for count, row in enumerate(lines.iterator(chunk_size=EXPORT_CHUNK_SIZE), start=1):
+
+            write([_export_value(value) for value in row])
+
+            if count % EXPORT_CHUNK_SIZE == 0:
+                yield flush()
+
+    if buffer.tell():
+        yield flush()
+
+
+async def aiter_in_sync_thread(iterator):
+
+    """
+        Async iterator over a sync generator for ASGI streaming responses. Every item is produced
+        in the request's sync thread, so database cursors and transactions stay on one connection;
+        the generator is closed there when the response stops early.
+        Without it Django collects a sync iterator with sync_to_async(list) before sending anything.
+    """
+
+    next_item = sync_to_async(next, thread_sensitive=True)
+    done = object()
+
+    try:
+        while True:
+
+            item = await next_item(iterator, done)
+
+            if item is done:
+                break
+
+            yield item
+    finally:
+        await sync_to_async(iterator.close, thread_sensitive=True)()
+
+
+def aiter_export(lines, export_format):
+
+    """
+        Async iter_export for ASGI. Closing it closes the cursor and ends the transaction
+        when the client goes away.
+    """
+
+    return aiter_in_sync_thread(iter_export(lines, export_format))
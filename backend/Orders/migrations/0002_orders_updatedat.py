@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orders',
+            name='UpdatedAt',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
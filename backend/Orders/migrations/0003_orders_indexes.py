@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Orders', '0002_orders_updatedat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['OrderStatus', '-OrderDate', '-id'], name='orders_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(condition=models.Q(('OrderStatus', 'cancelled'), _negated=True), fields=['-OrderDate', '-id'], name='orders_open_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orders',
+            index=models.Index(fields=['OrderStatus', 'DueDate'], name='orders_status_due_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Orders', '0004_orders_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitems',
+            index=models.Index(fields=['Order', 'id'], name='orderitems_order_idx'),
+        ),
+    ]
@@ -23,6 +23,22 @@ class Orders(models.Model):
     OrderTotal = models.DecimalField(max_digits=10, decimal_places=2)
     OrderCosts = models.DecimalField(max_digits=10, decimal_places=2)
 
+    UpdatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # OrdersView pages of one status, newest first (keyset on OrderDate, id)
+            models.Index(fields=['OrderStatus', '-OrderDate', '-id'], name='orders_status_date_idx'),
+            # OrdersView ?type=all excludes cancelled orders
+            models.Index(
+                fields=['-OrderDate', '-id'], name='orders_open_date_idx',
+                condition=~models.Q(OrderStatus='cancelled'),
+            ),
+            models.Index(fields=['OrderStatus', 'DueDate'], name='orders_status_due_idx'),
+            # Changes feed (Sync.funcs), keyset on UpdatedAt, id
+            models.Index(fields=['UpdatedAt', 'id'], name='orders_updated_idx'),
+        ]
+
 
 class OrderItems(models.Model):
 
@@ -30,3 +46,9 @@ class OrderItems(models.Model):
     Product = models.ForeignKey(Products, on_delete=models.SET_NULL, null=True)
     Quantity = models.IntegerField()
     Price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            # Order export (Orders.funcs.export_order_lines) streams items in (Order, id) order
+            models.Index(fields=['Order', 'id'], name='orderitems_order_idx'),
+        ]
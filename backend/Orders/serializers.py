@@ -6,14 +6,12 @@ from Products.serializers import ProductSerializer
 
 class OrdersSerializer(serializers.Serializer):
     id = serializers.IntegerField()
-    CustomerName = serializers.SerializerMethodField()
+    # Annotated by the queryset (F('Customer__Name')), see OrdersView
+    CustomerName = serializers.CharField(allow_null=True)
     DueDate = serializers.DateTimeField()
     OrderStatus = serializers.CharField()
     OrderTotal = serializers.DecimalField(max_digits=10, decimal_places=2)
 
-    def get_CustomerName(self, obj):
-        return obj.Customer.Name
-
 
 class OrderItemSerializer(serializers.Serializer):
     
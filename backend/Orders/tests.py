@@ -1,3 +1,547 @@
-from django.test import TestCase
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from asgiref.sync import async_to_sync
+from unittest import mock, skipUnless
+import asyncio
+import csv
+import io
+import tempfile
+import random
+import json
+import os
+
+from Auth.funcs import generate_token
+from Customers.models import Customers
+from Orders.events import ORDER_EVENTS_CHANNEL, ORDER_EVENTS_PATH, order_events_app
+from Orders.funcs import ORDER_LIST_FILTERS, EXPORT_COLUMNS, orders_by_type, create_order, track_status_change, import_orders
+from Orders.funcs import aiter_in_sync_thread
+from Orders.models import Orders, OrderItems
+from Products.models import Products
+from Dashboard.models import DailyProfits
+from LiveFire import profiling
+from LiveFire.events import get_bus
+from LiveFire.global_funcs import encode_cursor, _keyset_page_query
 
 # Create your tests here.
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class OrderViewGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customers.objects.create(Name='Customer')
+
+        products = Products.objects.bulk_create([
+            Products(Name=f'Candle {i}', Price=10, Costs=4, Image=f'products/{i}.jpg', InStock=100)
+            for i in range(50)
+        ])
+
+        cls.order = Orders.objects.create(
+            Customer=customer,
+            OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
+            OrderTotal=500,
+            OrderCosts=200,
+        )
+
+        OrderItems.objects.bulk_create([
+            OrderItems(Order=cls.order, Product=product, Quantity=1, Price=product.Price)
+            for product in products
+        ])
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def test_query_count_does_not_depend_on_items(self):
+        # One query for the order with its customer, one for the items with their products
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/orders/get_order/', {'order_id': self.order.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']['OrderItems']), 50)
+
+    def test_missing_order(self):
+        response = self.client.get('/api/v1/orders/get_order/', {'order_id': self.order.pk + 1})
+
+        self.assertEqual(response.status_code, 404)
+
+
+
+class OrderWriteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customers.objects.create(Name='Customer')
+
+        cls.products = Products.objects.bulk_create([
+            Products(Name=f'Candle {i}', Price=10, Costs=4, Image=f'products/{i}.jpg', InStock=100)
+            for i in range(100)
+        ])
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        create_order(self.customer.pk, None, {self.products[0].pk: 1})
+
+        with CaptureQueriesContext(connection) as one_line:
+            create_order(self.customer.pk, None, {self.products[1].pk: 1})
+
+        with self.assertNumQueries(len(one_line)):
+            Order = create_order(self.customer.pk, None, {product.pk: 2 for product in self.products})
+
+        self.assertEqual(Order.OrderItems.count(), 100)
+        self.assertEqual(Order.OrderTotal, 2000)
+        self.assertEqual(Products.objects.get(pk=self.products[5].pk).InStock, 98)
+
+    def test_deleted_product_is_not_dropped(self):
+        cart = {self.products[0].pk: 1, self.products[-1].pk + 1: 1}
+
+        with self.assertRaises(Products.DoesNotExist):
+            create_order(self.customer.pk, None, cart)
+
+        self.assertFalse(Orders.objects.exists())
+        self.assertEqual(Products.objects.get(pk=self.products[0].pk).InStock, 100)
+
+    def delete(self, Order):
+        return self.client.delete('/api/v1/orders/delete_order/', {'order_id': str(Order.pk)}, content_type='application/json')
+
+    def test_cancel_returns_stock_once(self):
+        Order = create_order(self.customer.pk, None, {self.products[0].pk: 3, self.products[1].pk: 1})
+
+        self.assertEqual(self.delete(Order).status_code, 200)
+        self.assertEqual(self.delete(Order).status_code, 400)
+
+        Order.refresh_from_db()
+        self.assertEqual(Order.OrderStatus, Orders.OrderStatusChoices.CANCELLED)
+        self.assertEqual(
+            list(Products.objects.filter(pk__in=[self.products[0].pk, self.products[1].pk]).order_by('pk').values_list('InStock', flat=True)),
+            [100, 100],
+        )
+
+    def test_completed_order_cannot_be_cancelled(self):
+        Order = create_order(self.customer.pk, None, {self.products[0].pk: 3})
+        Orders.objects.filter(pk=Order.pk).update(OrderStatus=Orders.OrderStatusChoices.COMPLETED)
+
+        response = self.delete(Order)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Order is completed')
+        self.assertEqual(Products.objects.get(pk=self.products[0].pk).InStock, 97)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL')
+class OrdersListPlanTests(TestCase):
+
+    """
+        The OrdersView page queries must be served by the indexes from
+        Orders/migrations/0003_orders_indexes.py, not by scanning the whole table.
+    """
+
+    ORDERS_COUNT = 50000
+
+    @classmethod
+    def setUpTestData(cls):
+        customers = Customers.objects.bulk_create([Customers(Name=f'Customer {i}') for i in range(1000)])
+
+        statuses = Orders.OrderStatusChoices.values
+        rng = random.Random(16)
+
+        Orders.objects.bulk_create([
+            Orders(
+                Customer=rng.choice(customers),
+                OrderStatus=rng.choice(statuses),
+                OrderTotal=100,
+                OrderCosts=40,
+            )
+            for _ in range(cls.ORDERS_COUNT)
+        ], batch_size=5000)
+
+        with connection.cursor() as cursor:
+            # auto_now_add gives every seeded order the same date, spread them over ~a month
+            cursor.execute('UPDATE "Orders_orders" SET "OrderDate" = now() - id * interval \'1 minute\', "DueDate" = now() + id * interval \'1 minute\'')
+            cursor.execute('ANALYZE "Orders_orders"')
+            cursor.execute('ANALYZE "Customers_customers"')
+
+        cls.middle = Orders.objects.order_by('-OrderDate').values('OrderDate', 'id')[cls.ORDERS_COUNT // 2]
+
+    def assertNoSeqScan(self, queryset):
+        plan = queryset.explain()
+
+        self.assertNotIn('Seq Scan on "Orders_orders"', plan, plan)
+
+    def page_query(self, order_type, **params):
+        request = RequestFactory().get('/api/v1/orders/get_orders/', {'type': order_type, **params})
+
+        orders = orders_by_type(order_type).annotate(CustomerName=F('Customer__Name')).only(
+            'id', 'OrderDate', 'DueDate', 'OrderStatus', 'OrderTotal'
+        )
+
+        query, _ = _keyset_page_query(orders, request, 'OrderDate', 50)
+
+        return query
+
+    def test_first_page(self):
+        for order_type in ORDER_LIST_FILTERS:
+            with self.subTest(order_type):
+                self.assertNoSeqScan(self.page_query(order_type))
+
+    def test_cursor_page(self):
+        cursor = encode_cursor(self.middle['OrderDate'], self.middle['id'])
+
+        for order_type in ORDER_LIST_FILTERS:
+            with self.subTest(order_type):
+                self.assertNoSeqScan(self.page_query(order_type, cursor=cursor))
+
+    def test_status_by_due_date(self):
+        self.assertNoSeqScan(
+            Orders.objects.filter(
+                OrderStatus=Orders.OrderStatusChoices.COMPLETED,
+                DueDate__lte=self.middle['OrderDate'],
+            )
+        )
+
+
+@override_settings(
+    METRICS={'ENABLED': True, 'SERVER_TIMING': True, 'TOKEN': 'scrape'},
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+)
+class RequestMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.order = Orders.objects.create(
+            Customer=Customers.objects.create(Name='Customer'),
+            OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
+            OrderTotal=10,
+            OrderCosts=4,
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get('/api/v1/orders/get_order/', {'order_id': self.order.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+        metrics = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+
+        self.assertIn('livefire_request_db_queries_bucket{view="get_order",method="GET",le="2"}', metrics)
+        self.assertIn('livefire_responses_total{view="get_order",method="GET",status="200"}', metrics)
+
+
+class RequestProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.order = Orders.objects.create(
+            Customer=Customers.objects.create(Name='Customer'),
+            OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
+            OrderTotal=10,
+            OrderCosts=4,
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        settings = override_settings(
+            PROFILING={'ENABLED': True, 'ADMIN_USER_IDS': [1], 'SAMPLE_RATE': 0, 'DIRECTORY': self.directory, 'MAX_QUERIES': 100},
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get_order(self, user_id, **headers):
+        return self.client.get(
+            '/api/v1/orders/get_order/', {'order_id': self.order.pk},
+            HTTP_AUTHORIZATION=f'Bearer {generate_token(user_id)}', **headers,
+        )
+
+    def test_admin_header_writes_profile(self):
+        response = self.get_order(1, HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+
+        profile_id = response['X-Profile-Id']
+
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f'{profile_id}.prof')))
+
+        with open(os.path.join(self.directory, f'{profile_id}.json')) as file:
+            metadata = json.load(file)
+
+        self.assertEqual(metadata['view'], 'Orders.views.OrderView')
+        self.assertEqual(metadata['sql_count'], 2)
+
+    def test_other_requests_are_not_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.get_order(1))
+        self.assertNotIn('X-Profile-Id', self.get_order(2, HTTP_X_PROFILE='1'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_one_async_profile_at_a_time(self):
+        def get_orders():
+            return self.client.get('/api/v1/orders/get_orders/', {'type': 'all'}, HTTP_AUTHORIZATION=f'Bearer {generate_token(1)}', HTTP_X_PROFILE='1')
+
+        self.assertIn('X-Profile-Id', get_orders())
+
+        with profiling._shared_threads_lock:
+            response = get_orders()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+
+class OrderEventsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customers.objects.create(Name='Customer')
+        cls.product = Products.objects.create(Name='Candle', Price=10, Costs=4, Image='products/a.jpg', InStock=10)
+
+    def test_published_after_commit(self):
+        with mock.patch.object(get_bus(), 'publish') as publish:
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Order = create_order(self.customer.pk, None, {self.product.pk: 2})
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Order.OrderStatus = Orders.OrderStatusChoices.CANCELLED
+                Order.save()
+                track_status_change(Order, Orders.OrderStatusChoices.IN_PROGRESS)
+
+        events = [call.args[1] for call in publish.call_args_list]
+
+        self.assertEqual([event['type'] for event in events], ['order.created', 'order.cancelled'])
+        self.assertEqual(events[0]['order']['CustomerName'], 'Customer')
+        self.assertEqual(events[1]['previous_status'], 'in_progress')
+
+    def stream(self, headers):
+
+        """
+            Runs order_events_app until the first event (published once the stream is open)
+            or the end of the response. Returns the messages it sent.
+        """
+
+        async def scenario():
+
+            received = asyncio.Queue()
+            sent = []
+            opened = asyncio.Event()
+            got_event = asyncio.Event()
+
+            async def send(message):
+                sent.append(message)
+
+                if message.get('more_body'):
+                    (got_event if b'event:' in message['body'] else opened).set()
+
+            scope = {'type': 'http', 'method': 'GET', 'path': ORDER_EVENTS_PATH, 'query_string': b'', 'headers': headers}
+            task = asyncio.ensure_future(order_events_app(scope, received.get, send))
+
+            await asyncio.wait({task, asyncio.ensure_future(opened.wait())}, return_when=asyncio.FIRST_COMPLETED)
+
+            if not task.done():
+                get_bus().publish(ORDER_EVENTS_CHANNEL, {'type': 'order.created', 'order': {'id': 1}})
+                await asyncio.wait_for(got_event.wait(), 5)
+                await received.put({'type': 'http.disconnect'})
+
+            await asyncio.wait_for(task, 5)
+
+            return sent
+
+        return async_to_sync(scenario)()
+
+    def test_stream(self):
+        sent = self.stream([(b'authorization', f'Bearer {generate_token(1)}'.encode())])
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'event: order.created\ndata: {"type": "order.created", "order": {"id": 1}}', sent[-1]['body'])
+
+    def test_unauthorized(self):
+        self.assertEqual(self.stream([])[0]['status'], 403)
+
+
+class ExportOrdersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customers.objects.create(Name='Анна, "Свечи"', Email='anna@example.com')
+        candle = Products.objects.create(Name='Candle', Price=10, Costs=4, Image='products/a.jpg', InStock=10)
+        box = Products.objects.create(Name='Gift box', Price=3, Costs=1, Image='products/b.jpg', InStock=10)
+
+        cls.order = create_order(customer.pk, None, {candle.pk: 2, box.pk: 1})
+        cls.cancelled = create_order(customer.pk, None, {candle.pk: 1})
+        Orders.objects.filter(pk=cls.cancelled.pk).update(OrderStatus=Orders.OrderStatusChoices.CANCELLED)
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def test_csv(self):
+        response = self.client.get('/api/v1/orders/export_orders/', {'status': ['in_progress', 'packed']})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+
+        self.assertEqual(rows[0], [column for column, _ in EXPORT_COLUMNS])
+        self.assertEqual([(row[0], row[12], row[13], row[14]) for row in rows[1:]], [
+            (str(self.order.pk), 'Candle', '2', '20.00'),
+            (str(self.order.pk), 'Gift box', '1', '3.00'),
+        ])
+        self.assertEqual(rows[1][7], 'Анна, "Свечи"')
+        self.assertEqual(rows[1][9], '')
+
+    async def test_ndjson_asgi(self):
+        response = await self.async_client.get(
+            '/api/v1/orders/export_orders/', {'format': 'ndjson', 'status': 'cancelled'},
+            AUTHORIZATION=f'Bearer {generate_token(1)}',
+        )
+
+        # ASGI requests get an async iterator, served without buffering
+        self.assertTrue(response.is_async)
+
+        lines = [json.loads(line) for line in b''.join([chunk async for chunk in response.streaming_content]).splitlines()]
+
+        self.assertEqual([(line['order_id'], line['quantity'], line['line_total']) for line in lines], [(self.cancelled.pk, 1, '10.00')])
+        self.assertEqual(lines[0]['customer_phone'], None)
+
+    def test_dates(self):
+        response = self.client.get('/api/v1/orders/export_orders/', {'format': 'ndjson', 'date_to': '2000-01-01'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        response = self.client.get('/api/v1/orders/export_orders/', {'date_from': '2000-01-02', 'date_to': '2000-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportOrdersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customers.objects.create(Name='Customer')
+        cls.candle = Products.objects.create(Name='Candle', Price=10, Costs=4, Image='products/a.jpg', InStock=100)
+        cls.box = Products.objects.create(Name='Gift box', Price=3, Costs=1, Image='products/b.jpg', InStock=100)
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def line(self, cart, customer_id=None):
+        return json.dumps({'customer_id': customer_id or self.customer.pk, 'due_date': '2026-01-15', 'cart_data': cart})
+
+    def test_mixed_lines(self):
+        body = '\n'.join([
+            self.line({self.candle.pk: 2}),
+            'not json',
+            '',
+            self.line({self.candle.pk: 1}, customer_id=self.customer.pk + 100),
+            self.line({self.box.pk + 100: 1}),
+            self.line({self.candle.pk: 1, self.box.pk: 3}),
+            '[1, 2]',
+        ])
+
+        response = self.client.post('/api/v1/orders/import_orders/', body, content_type='application/x-ndjson')
+        results = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual([(result['line'], result['status']) for result in results], [
+            (1, 'created'), (2, 'error'), (4, 'error'), (5, 'error'), (6, 'created'), (7, 'error'),
+        ])
+        self.assertEqual(results[2]['errors'], f'Customer with id={self.customer.pk + 100} not found')
+
+        # Stock, rollup and customer totals are updated like by create_order
+        self.assertEqual(Products.objects.get(pk=self.candle.pk).InStock, 97)
+        self.assertEqual(Products.objects.get(pk=self.box.pk).InStock, 97)
+
+        rollup = DailyProfits.objects.get(OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS)
+        self.assertEqual((rollup.OrdersCount, rollup.Revenue, rollup.Costs), (2, 39, 15))
+
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.OrdersCount, 2)
+
+    def test_chunks_are_reported_in_line_order_when_committed(self):
+        read = []
+
+        def lines():
+            for number, line in enumerate([
+                self.line({self.candle.pk: 1}),
+                'not json',
+                self.line({self.candle.pk: 1}),
+                'not json',
+                self.line({self.candle.pk: 1}),
+            ], start=1):
+                read.append(number)
+                yield line
+
+        results = import_orders(lines(), chunk_size=2)
+
+        first_chunk = [next(results), next(results)]
+
+        self.assertEqual([(result['line'], result['status']) for result in first_chunk], [(1, 'created'), (2, 'error')])
+        # Nothing after the chunk was read before its results
+        self.assertEqual(read, [1, 2])
+        self.assertEqual(Orders.objects.count(), 1)
+
+        # The client went away: the import stops after the committed chunk
+        results.close()
+
+        self.assertEqual(read, [1, 2])
+        self.assertEqual(Orders.objects.count(), 1)
+        self.assertEqual(Products.objects.get(pk=self.candle.pk).InStock, 99)
+
+    async def test_asgi_streams_results(self):
+        body = '\n'.join([self.line({self.candle.pk: 1}), 'not json'])
+
+        response = await self.async_client.post(
+            '/api/v1/orders/import_orders/', body, content_type='application/x-ndjson', AUTHORIZATION=f'Bearer {generate_token(1)}',
+        )
+
+        # Served without collecting every result first
+        self.assertTrue(response.is_async)
+
+        results = [json.loads(line) for line in b''.join([chunk async for chunk in response.streaming_content]).splitlines()]
+
+        self.assertEqual([(result['line'], result['status']) for result in results], [(1, 'created'), (2, 'error')])
+        self.assertEqual(await Orders.objects.acount(), 1)
+
+    async def test_asgi_stops_when_closed(self):
+        read = []
+
+        def lines():
+            for number in range(1, 5):
+                read.append(number)
+                yield self.line({self.candle.pk: 1})
+
+        results = aiter_in_sync_thread(import_orders(lines(), chunk_size=2))
+
+        self.assertEqual((await results.__anext__())['line'], 1)
+
+        await results.aclose()
+
+        self.assertEqual(read, [1, 2])
+        self.assertEqual(await Orders.objects.acount(), 2)
+
+    def test_chunk_boundaries(self):
+        lines = [self.line({self.candle.pk: 1}) for _ in range(5)]
+
+        results = list(import_orders(lines, chunk_size=2))
+
+        self.assertEqual([result['line'] for result in results], [1, 2, 3, 4, 5])
+        self.assertEqual(Orders.objects.count(), 5)
+        self.assertEqual(Products.objects.get(pk=self.candle.pk).InStock, 95)
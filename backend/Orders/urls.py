@@ -25,4 +25,7 @@ urlpatterns = [
     path('create_order/', views.OrderView.as_view(), name='create_order'),
     path('update_order/', views.OrderView.as_view(), name='update_order'),
     path('delete_order/', views.OrderView.as_view(), name='delete_order'),
+
+    path('import_orders/', views.ImportOrdersView.as_view(), name='import_orders'),
+    path('export_orders/', views.ExportOrdersView.as_view(), name='export_orders'),
 ]
@@ -1,53 +1,64 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.http import StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+from django.views import View
+import json
 
 from Orders.models import Orders, OrderItems
 from Products.models import Products
 from Customers.models import Customers
 from Orders.serializers import OrderSerializer, OrdersSerializer
-from Orders.forms import CartForm
+from Orders.forms import CartForm, OrderExportForm
+from Orders.funcs import create_order, cancel_order, import_orders, track_status_change, orders_by_type, export_order_lines, iter_export, aiter_export
+from Orders.funcs import aiter_in_sync_thread
 
-from LiveFire.global_funcs import auth_required, standard_response
+from LiveFire.global_funcs import auth_required, standard_response, standard_json_response
 from LiveFire import global_funcs
+from LiveFire.metrics import serialize_timer
 
 # Create your views here.
 
 @auth_required()
-class OrdersView(APIView):
-    def get(self, request):
+class OrdersView(View):
+    async def get(self, request):
 
         fields = ['type']
 
         if global_funcs.check_fileds_in_request(request, "GET", fields):
 
-            if request.GET.get('type') == 'all':
+            orders = orders_by_type(request.GET.get('type'))
 
-                orders = Orders.objects.exclude(OrderStatus=Orders.OrderStatusChoices.CANCELLED)
-                return standard_response(data=OrdersSerializer(orders, many=True).data)
-            
-            elif request.GET.get('type') == 'active':
+            if orders is not None:
 
-                orders = Orders.objects.filter(OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS)
-                return standard_response(data=OrdersSerializer(orders, many=True).data)
-            
-            elif request.GET.get('type') == 'packed':
+                # Customer name comes from the same query instead of one query per row
+                orders = orders.annotate(CustomerName=F('Customer__Name')).only(
+                    'id', 'OrderDate', 'DueDate', 'OrderStatus', 'OrderTotal'
+                )
 
-                orders = Orders.objects.filter(OrderStatus=Orders.OrderStatusChoices.PACKED)
-                return standard_response(data=OrdersSerializer(orders, many=True).data)
-            
-            elif request.GET.get('type') == 'completed':
+                async def build_response():
 
-                orders = Orders.objects.filter(OrderStatus=Orders.OrderStatusChoices.COMPLETED)
-                return standard_response(data=OrdersSerializer(orders, many=True).data)
-            
-            elif request.GET.get('type') == 'cancelled':
+                    page, next_cursor = await global_funcs.akeyset_paginate(orders, request, 'OrderDate')
+
+                    if page is None:
+                        return standard_json_response(message='Incorrect cursor or limit', status_code=status.HTTP_400_BAD_REQUEST)
+
+                    with serialize_timer():
+                        data = OrdersSerializer(page, many=True).data
 
-                orders = Orders.objects.filter(OrderStatus=Orders.OrderStatusChoices.CANCELLED)
-                return standard_response(data=OrdersSerializer(orders, many=True).data)
+                    return standard_json_response(data=data, next=next_cursor)
+
+                # Renaming a customer changes CustomerName without touching the order
+                return await global_funcs.aconditional_list_response(
+                    request, orders, build_response, 'UpdatedAt', 'Customer__UpdatedAt'
+                )
             
             
-        return standard_response(message='Incorrect fields', status_code=status.HTTP_400_BAD_REQUEST)
+        return standard_json_response(message='Incorrect fields', status_code=status.HTTP_400_BAD_REQUEST)
     
 
 @auth_required()
@@ -60,10 +71,13 @@ class OrderView(APIView):
 
             if request.GET.get('order_id').isdigit():
 
-                if Orders.objects.filter(pk=request.GET.get('order_id')).exists():
-
-                    Order = Orders.objects.get(id=request.GET.get('order_id'))
+                # Customer is joined and items are prefetched together with their products,
+                # so the query count does not grow with the number of order lines
+                Order = Orders.objects.select_related('Customer').prefetch_related(
+                    Prefetch('OrderItems', queryset=OrderItems.objects.select_related('Product').order_by('id'))
+                ).filter(pk=request.GET.get('order_id')).first()
 
+                if Order is not None:
                     
                     return standard_response(data=OrderSerializer(Order).data)
                 
@@ -78,39 +92,15 @@ class OrderView(APIView):
 
         if form.is_valid():
 
-            Order = Orders.objects.create(
-                Customer=Customers.objects.get(pk=form.cleaned_data['customer_id']),
-                DueDate=form.cleaned_data['due_date'],
-                OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
-                OrderTotal=0,
-                OrderCosts=0,
-            )
-            Order.save()
-
-            total_price = 0
-            total_costs = 0
-
-            for product_id, quantity in form.cleaned_data['cart_data'].items():
-                product = Products.objects.get(pk=product_id)
-
-                product.InStock -= quantity
-                product.save()
-
-                OrderItem = OrderItems.objects.create(
-                    Order=Order,
-                    Product=product,
-                    Quantity=quantity,
-                    Price=product.Price*quantity,
+            try:
+                Order = create_order(
+                    form.cleaned_data['customer_id'],
+                    form.cleaned_data['due_date'],
+                    form.cleaned_data['cart_data'],
                 )
-                OrderItem.save()
-                total_price += product.Price*quantity
-                total_costs += product.Costs*quantity
-            
-            Order.OrderTotal = total_price
-            Order.OrderCosts = total_costs
-            Order.save()
-
-
+            except Products.DoesNotExist:
+                # Deleted after the cart was validated
+                return standard_response(message='Product not found', status_code=status.HTTP_400_BAD_REQUEST)
 
             return standard_response(message='Order created successfully', data={'order_id': Order.pk})
         
@@ -127,27 +117,33 @@ class OrderView(APIView):
 
                 if Orders.objects.filter(pk=request.data.get('order_id')).exists():
 
-                    Order = Orders.objects.get(pk=request.data.get('order_id'))
+                    with transaction.atomic():
 
-                    if Order.OrderStatus == Orders.OrderStatusChoices.CANCELLED:
-                        return standard_response(message='Order is cancelled', status_code=status.HTTP_400_BAD_REQUEST)
+                        # Locked, so the rollup sees the status this change actually replaces
+                        Order = Orders.objects.select_for_update().get(pk=request.data.get('order_id'))
+                        previous_status = Order.OrderStatus
 
-                    if request.data.get('status') == "completed":    
+                        if Order.OrderStatus == Orders.OrderStatusChoices.CANCELLED:
+                            return standard_response(message='Order is cancelled', status_code=status.HTTP_400_BAD_REQUEST)
 
-                        Order.OrderStatus = Orders.OrderStatusChoices.COMPLETED
+                        if request.data.get('status') == "completed":    
 
-                    elif request.data.get('status') == "packed":
+                            Order.OrderStatus = Orders.OrderStatusChoices.COMPLETED
 
-                        Order.OrderStatus = Orders.OrderStatusChoices.PACKED
+                        elif request.data.get('status') == "packed":
 
-                    elif request.data.get('status') == "in_progress":
+                            Order.OrderStatus = Orders.OrderStatusChoices.PACKED
 
-                        Order.OrderStatus = Orders.OrderStatusChoices.IN_PROGRESS
+                        elif request.data.get('status') == "in_progress":
 
-                    else:
-                        return standard_response(message='Incorrect status', status_code=status.HTTP_400_BAD_REQUEST)
+                            Order.OrderStatus = Orders.OrderStatusChoices.IN_PROGRESS
+
+                        else:
+                            return standard_response(message='Incorrect status', status_code=status.HTTP_400_BAD_REQUEST)
                     
-                    Order.save()
+                        Order.save()
+
+                        track_status_change(Order, previous_status)
 
                     return standard_response(message='Order status updated successfully')
                 
@@ -167,22 +163,66 @@ class OrderView(APIView):
 
                 if Orders.objects.filter(pk=request.data.get('order_id')).exists():
 
-                    Order = Orders.objects.get(pk=request.data.get('order_id'))
+                    with transaction.atomic():
 
-                    if Order.OrderStatus != Orders.OrderStatusChoices.COMPLETED or Order.OrderStatus != Orders.OrderStatusChoices.CANCELLED:
+                        Order = Orders.objects.select_for_update().get(pk=request.data.get('order_id'))
 
-                        for item in Order.OrderItems.all():
+                        if Order.OrderStatus == Orders.OrderStatusChoices.COMPLETED:
+                            return standard_response(message='Order is completed', status_code=status.HTTP_400_BAD_REQUEST)
 
-                            item.Product.InStock += item.Quantity
-                            item.Product.save()
+                        if Order.OrderStatus == Orders.OrderStatusChoices.CANCELLED:
+                            return standard_response(message='Order is cancelled', status_code=status.HTTP_400_BAD_REQUEST)
 
-                        Order.OrderStatus = Orders.OrderStatusChoices.CANCELLED
-                        Order.save()
+                        cancel_order(Order)
 
-                        return standard_response(message='Order deleted successfully')
-                    
-                    return standard_response(message='Order is completed', status_code=status.HTTP_400_BAD_REQUEST)
+                    return standard_response(message='Order deleted successfully')
                 
             return standard_response(message='Order not found', status_code=status.HTTP_404_NOT_FOUND)
         
-        return standard_response(message='Incorrect fields', status_code=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return standard_response(message='Incorrect fields', status_code=status.HTTP_400_BAD_REQUEST)
+
+
+@auth_required()
+class ImportOrdersView(APIView):
+    def post(self, request):
+
+        # The body is read line by line, request.data is never parsed.
+        # Without Content-Length (chunked uploads) Django reads no body at all
+        if request.stream is None:
+            return standard_response(message='Empty body, Content-Length is required', status_code=status.HTTP_400_BAD_REQUEST)
+
+        lines = (json.dumps(result, ensure_ascii=False) + '\n' for result in import_orders(request.stream))
+
+        # Like the export: a sync iterator would be collected in full before the first result is sent
+        if isinstance(request._request, ASGIRequest):
+            lines = aiter_in_sync_thread(lines)
+
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+@auth_required()
+class ExportOrdersView(View):
+    def get(self, request):
+
+        form = OrderExportForm(request.GET)
+
+        if not form.is_valid():
+            return standard_json_response(data={'error': form.errors}, status_code=status.HTTP_400_BAD_REQUEST)
+
+        export_format = form.cleaned_data['format'] or 'csv'
+
+        lines = export_order_lines(form.cleaned_data['status'], form.cleaned_data['date_from'], form.cleaned_data['date_to'])
+
+        # Each server type needs its own kind of iterator, otherwise Django buffers the whole export
+        if isinstance(request, ASGIRequest):
+            content = aiter_export(lines, export_format)
+        else:
+            content = iter_export(lines, export_format)
+
+        response = StreamingHttpResponse(
+            content,
+            content_type='text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders-{timezone.now():%Y%m%d}.{export_format}"'
+
+        return response
@@ -7,9 +7,19 @@ class ProductsForm(forms.Form):
     Price = forms.DecimalField()
     Costs = forms.DecimalField()
     Description = forms.CharField()
-    Image = forms.ImageField()
+    # Either an uploaded file or the key of an image uploaded directly to MinIO
+    Image = forms.ImageField(required=False)
+    ImageKey = forms.CharField(required=False, empty_value=None)
     InStock = forms.IntegerField()
 
+    def clean(self):
+        cleaned_data = super().clean()
+
+        if not cleaned_data.get('Image') and not cleaned_data.get('ImageKey') and 'Image' not in self.errors:
+            raise forms.ValidationError("Image or ImageKey is required.")
+
+        return cleaned_data
+
     def clean_Image(self):
         image = self.cleaned_data['Image']
         
@@ -38,4 +48,45 @@ class ProductUpdateForm(forms.Form):
             extension = os.path.splitext(image.name)[1].lower()  # Получаем расширение файла
             if extension not in ['.png', '.jpg', '.jpeg']:
                 raise forms.ValidationError("Допустимые форматы файлов: PNG, JPG, JPEG.")
-        return image
\ No newline at end of file
+        return image
+
+
+class ProductBulkUpdateForm(forms.Form):
+    """
+        One row of a bulk update: new Price, Costs and InStock,
+        or InStockDelta added to the current stock (a delivery, a write-off).
+    """
+
+    product_id = forms.IntegerField()
+    Price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+    Costs = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2)
+    InStock = forms.IntegerField(required=False, min_value=0)
+    InStockDelta = forms.IntegerField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        if cleaned_data.get('InStock') is not None and cleaned_data.get('InStockDelta') is not None:
+            raise forms.ValidationError("InStock and InStockDelta are mutually exclusive.")
+
+        if all(cleaned_data.get(field) is None for field in ['Price', 'Costs', 'InStock', 'InStockDelta']):
+            raise forms.ValidationError("Nothing to update.")
+
+        return cleaned_data
+
+
+class ImageUploadForm(forms.Form):
+    filename = forms.CharField()
+
+    def clean_filename(self):
+        filename = self.cleaned_data['filename']
+
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in ['.png', '.jpg', '.jpeg']:
+            raise forms.ValidationError("Допустимые форматы файлов: PNG, JPG, JPEG.")
+        return filename
+
+
+class AttachImageForm(forms.Form):
+    product_id = forms.IntegerField()
+    ImageKey = forms.CharField()
@@ -0,0 +1,467 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Case, When, F, Q
+from django.db.models.functions import Now, Greatest
+from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank, TrigramWordSimilarity
+from io import BytesIO
+from functools import lru_cache
+from PIL import Image, ImageOps
+from botocore.client import Config
+from botocore.exceptions import ClientError
+import posixpath
+import threading
+import logging
+import boto3
+import re
+import os
+
+from Products.models import Products
+from Products.serializers import ProductsSerializer
+from Products.forms import ProductBulkUpdateForm
+
+
+CATALOG_KEY = 'products:catalog'
+CATALOG_VERSION_KEY = 'products:catalog:version'
+CATALOG_TIMEOUT = 60 * 60
+
+# Longest side in pixels of every generated variant
+IMAGE_VARIANTS = {
+    'thumbnail': 200,
+    'card': 600,
+    'full': 1600,
+}
+
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+IMAGE_CONTENT_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+}
+
+# Keys produced by Products.upload_product, the only ones that can be attached to a product
+UPLOADED_IMAGE_KEY = re.compile(r'^products/[A-Za-z]{32}\.(png|jpg|jpeg)$')
+
+IMAGE_UPLOAD_EXPIRES = 10 * 60
+
+# Rows per UPDATE statement of bulk_update_products, and rows accepted per request
+BULK_UPDATE_BATCH_SIZE = 500
+BULK_UPDATE_MAX_ROWS = 5000
+
+logger = logging.getLogger(__name__)
+
+catalog_cache_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        catalog_cache_stats[name] += 1
+
+
+def _cached_catalog(cached):
+
+    version = cached.get(CATALOG_VERSION_KEY, 0)
+    entry = cached.get(CATALOG_KEY)
+
+    if entry is not None and entry['version'] == version:
+        _count('hits')
+        return version, entry['data']
+
+    _count('misses')
+    return version, None
+
+
+def get_catalog():
+
+    """
+        Returns the serialized product catalog.
+        The entry and the current catalog version are read with one round trip (MGET);
+        an entry built for an older version is treated as a miss.
+    """
+
+    version, data = _cached_catalog(cache.get_many([CATALOG_KEY, CATALOG_VERSION_KEY]))
+
+    if data is not None:
+        return data
+
+    data = list(ProductsSerializer(Products.objects.all(), many=True).data)
+
+    # Tagged with the version read before the query, so a concurrent invalidation makes it stale
+    cache.set(CATALOG_KEY, {'version': version, 'data': data}, CATALOG_TIMEOUT)
+
+    return data
+
+
+async def aget_catalog():
+
+    """
+        Async get_catalog.
+    """
+
+    version, data = _cached_catalog(await cache.aget_many([CATALOG_KEY, CATALOG_VERSION_KEY]))
+
+    if data is not None:
+        return data
+
+    products = [product async for product in Products.objects.all()]
+    data = list(ProductsSerializer(products, many=True).data)
+
+    await cache.aset(CATALOG_KEY, {'version': version, 'data': data}, CATALOG_TIMEOUT)
+
+    return data
+
+
+def invalidate_catalog():
+
+    """
+        Bumps the catalog version; every cached entry built before this call is ignored.
+    """
+
+    cache.add(CATALOG_VERSION_KEY, 0, None)
+
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(CATALOG_VERSION_KEY, 1, None)
+
+
+def bulk_update_products(rows):
+
+    """
+        Applies a list of {product_id, Price?, Costs?, InStock? | InStockDelta?} rows
+        (see ProductBulkUpdateForm) in one transaction, with one UPDATE per
+        BULK_UPDATE_BATCH_SIZE rows; InStockDelta is added to the current stock.
+        Invalid rows, unknown products and stock that would go negative are reported and skipped.
+        Returns one result dict per row, in request order.
+    """
+
+    results = [None] * len(rows)
+    changes = {}
+
+    for index, row in enumerate(rows):
+
+        form = ProductBulkUpdateForm(row if isinstance(row, dict) else None)
+
+        if not form.is_valid():
+            results[index] = {'index': index, 'status': 'error', 'errors': form.errors}
+            continue
+
+        product_id = form.cleaned_data['product_id']
+
+        if product_id in changes:
+            results[index] = {'index': index, 'product_id': product_id, 'status': 'error', 'errors': 'Duplicate product_id'}
+            continue
+
+        changes[product_id] = (index, form.cleaned_data)
+
+    with transaction.atomic():
+
+        # Locked in primary key order, like create_order, so the two cannot deadlock
+        stock = dict(
+            Products.objects.select_for_update().filter(pk__in=changes.keys()).order_by('pk').values_list('pk', 'InStock')
+        )
+
+        for product_id, (index, cleaned_data) in list(changes.items()):
+
+            error = None
+
+            if product_id not in stock:
+                error = 'Product not found'
+            elif cleaned_data['InStockDelta'] is not None and stock[product_id] + cleaned_data['InStockDelta'] < 0:
+                error = f'Not enough stock, {stock[product_id]} left'
+
+            if error:
+                results[index] = {'index': index, 'product_id': product_id, 'status': 'error', 'errors': error}
+                del changes[product_id]
+
+        product_ids = sorted(changes)
+
+        for start in range(0, len(product_ids), BULK_UPDATE_BATCH_SIZE):
+            _update_products_batch({product_id: changes[product_id][1] for product_id in product_ids[start:start + BULK_UPDATE_BATCH_SIZE]})
+
+        for product_id, price, costs, in_stock in Products.objects.filter(pk__in=changes.keys()).values_list('pk', 'Price', 'Costs', 'InStock'):
+            index = changes[product_id][0]
+            results[index] = {
+                'index': index,
+                'product_id': product_id,
+                'status': 'updated',
+                'product': {'Price': str(price), 'Costs': str(costs), 'InStock': in_stock},
+            }
+
+        if changes:
+            transaction.on_commit(invalidate_catalog)
+
+    return results
+
+
+def _update_products_batch(batch):
+
+    """
+        One UPDATE for {product_id: cleaned ProductBulkUpdateForm data}, a CASE per changed field.
+    """
+
+    def case(field, value):
+        whens = [When(pk=product_id, then=value(data)) for product_id, data in batch.items() if value(data) is not None]
+        return Case(*whens, default=F(field)) if whens else None
+
+    values = {
+        'Price': case('Price', lambda data: data['Price']),
+        'Costs': case('Costs', lambda data: data['Costs']),
+        'InStock': case('InStock', lambda data: (
+            data['InStock'] if data['InStockDelta'] is None else F('InStock') + data['InStockDelta']
+        )),
+    }
+
+    # update() bypasses auto_now, UpdatedAt is set explicitly for list validators and the sync feed
+    Products.objects.filter(pk__in=batch.keys()).update(
+        UpdatedAt=Now(),
+        **{field: value for field, value in values.items() if value is not None},
+    )
+
+
+def schedule_image_variants(product_id):
+
+    """
+        Queues the generation of the product's image variants (Products.tasks)
+        once the current transaction commits.
+    """
+
+    from Products.tasks import generate_image_variants as generate_image_variants_task
+
+    transaction.on_commit(lambda: generate_image_variants_task.delay(product_id))
+
+
+def product_image_names(product):
+
+    """
+        Storage names of the product's original image and of all its variants.
+    """
+
+    names = _variant_keys(product.ImageVariants)
+
+    if product.Image:
+        names.add(product.Image.name)
+
+    return names
+
+
+def schedule_image_deletion(names):
+
+    """
+        Queues the deletion of stored images (Products.tasks) once the current transaction commits,
+        e.g. the previous image and variants of a product whose image was replaced.
+    """
+
+    from Products.tasks import delete_images as delete_images_task
+
+    names = sorted(names)
+
+    if names:
+        transaction.on_commit(lambda: delete_images_task.delay(names))
+
+
+def delete_images(names):
+
+    """
+        Deletes stored images, except originals and variants another product still uses.
+    """
+
+    storage = Products._meta.get_field('Image').storage
+    in_use = set()
+
+    # Variant keys are derived from the original's name, so only products sharing an original share variants
+    for image, variants in Products.objects.filter(Image__in=names).values_list('Image', 'ImageVariants'):
+        in_use.add(image)
+        in_use |= _variant_keys(variants)
+
+    for name in names:
+        if name not in in_use:
+            storage.delete(name)
+
+
+def generate_image_variants(product_id):
+
+    """
+        Resizes the product's original image to every IMAGE_VARIANTS size in every IMAGE_FORMATS
+        format and stores the keys in Products.ImageVariants, then deletes the variants they replace.
+        Nothing is attached, and the new variants are deleted, if the image was replaced
+        while the variants were generated.
+    """
+
+    product = Products.objects.filter(pk=product_id).only('id', 'Image', 'ImageVariants').first()
+
+    if product is None or not product.Image:
+        return
+
+    source_name = product.Image.name
+    storage = product.Image.storage
+
+    with storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    variants = {}
+
+    for variant, size in IMAGE_VARIANTS.items():
+
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+
+        variants[variant] = {}
+
+        for extension, (image_format, options) in IMAGE_FORMATS.items():
+
+            converted = resized.convert('RGB') if image_format == 'JPEG' else resized
+
+            buffer = BytesIO()
+            converted.save(buffer, image_format, **options)
+
+            variants[variant][extension] = storage.save(
+                f'products/variants/{stem}_{variant}.{extension}', ContentFile(buffer.getvalue())
+            )
+
+    updated = Products.objects.filter(pk=product_id, Image=source_name).update(ImageVariants=variants, UpdatedAt=Now())
+
+    if updated:
+        invalidate_catalog()
+
+        # Left by an earlier run for the same image, unless the storage overwrote them
+        stale = _variant_keys(product.ImageVariants) - _variant_keys(variants)
+    else:
+        # Made for an image the product no longer has
+        stale = _variant_keys(variants)
+
+    for name in stale:
+        storage.delete(name)
+
+
+def _variant_keys(variants):
+    return {name for formats in variants.values() for name in formats.values()}
+
+
+@lru_cache(maxsize=None)
+def get_s3_client(public=False):
+
+    """
+        boto3 S3 client for MinIO. The public client signs URLs for the host browsers use
+        (settings.AWS_S3_PUBLIC_ENDPOINT_URL), the internal one talks to MinIO directly.
+    """
+
+    return boto3.client(
+        's3',
+        endpoint_url=settings.AWS_S3_PUBLIC_ENDPOINT_URL if public else settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name='us-east-1',
+        config=Config(signature_version='s3v4', s3={'addressing_style': 'path'}),
+    )
+
+
+def _object_key(key):
+    # Storage names are relative to AWS_LOCATION inside the bucket
+    return posixpath.join(settings.AWS_LOCATION, key)
+
+
+def create_image_upload(filename, client=None):
+
+    """
+        Reserves a key under products/ for `filename` and returns a presigned POST
+        the browser uploads the image with: {'key', 'url', 'fields'}.
+        The policy pins the content type and limits the size to PRODUCT_IMAGE_MAX_SIZE.
+    """
+
+    client = client or get_s3_client(public=True)
+
+    key = Products.upload_product(None, filename)
+    content_type = IMAGE_CONTENT_TYPES[os.path.splitext(key)[1]]
+
+    presigned = client.generate_presigned_post(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=_object_key(key),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, settings.PRODUCT_IMAGE_MAX_SIZE],
+        ],
+        ExpiresIn=IMAGE_UPLOAD_EXPIRES,
+    )
+
+    return {'key': key, 'url': presigned['url'], 'fields': presigned['fields']}
+
+
+def check_uploaded_image(key, client=None):
+
+    """
+        HEADs an image uploaded through create_image_upload.
+        Returns an error message, or None when the key can be attached to a product.
+    """
+
+    if not UPLOADED_IMAGE_KEY.match(key):
+        return 'Incorrect image key'
+
+    client = client or get_s3_client()
+
+    try:
+        head = client.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=_object_key(key))
+    except ClientError:
+        return 'Image not uploaded'
+
+    if head.get('ContentLength', 0) > settings.PRODUCT_IMAGE_MAX_SIZE:
+        return 'Image is too large'
+
+    if head.get('ContentType') not in IMAGE_CONTENT_TYPES.values():
+        return 'Incorrect image type'
+
+    return None
+
+
+# Same expression as the products_search_idx index, otherwise the index is not used
+SEARCH_VECTOR = SearchVector('Name', weight='A', config='simple') + SearchVector('Description', weight='B', config='simple')
+
+
+def prefix_search_query(term):
+
+    """
+        Full-text query matching every word of `term` as a prefix ("свеч аром" -> свеч:* & аром:*),
+        so results show up while the word is still being typed. None when `term` has no words.
+    """
+
+    words = re.findall(r'\w+', term.lower())
+
+    if not words:
+        return None
+
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config='simple')
+
+
+def search_products(term):
+
+    """
+        Products matching `term` by full text over Name and Description, or by trigram
+        word similarity of Name (typos), best matches first.
+    """
+
+    query = prefix_search_query(term)
+
+    matches = Q(Name__trigram_word_similar=term)
+    rank = TrigramWordSimilarity(term, 'Name')
+
+    if query is not None:
+        matches |= Q(search=query)
+        rank = Greatest(SearchRank(F('search'), query), rank)
+
+    return Products.objects.alias(search=SEARCH_VECTOR).filter(matches).annotate(rank=rank).order_by('-rank', 'id')
+
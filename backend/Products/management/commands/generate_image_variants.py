@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from Products.models import Products
+from Products.funcs import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = 'Generates image variants for products that have none yet (or for all with --all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate variants of every product')
+
+    def handle(self, *args, **options):
+
+        products = Products.objects.exclude(Image='')
+
+        if not options['all']:
+            products = products.filter(ImageVariants={})
+
+        for product_id in products.values_list('pk', flat=True).iterator():
+            generate_image_variants(product_id)
+            self.stdout.write(f'Product {product_id}: done')
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:53
+
+import Products.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Products',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Name', models.CharField(max_length=255)),
+                ('Price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('Costs', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('Description', models.TextField(default='')),
+                ('Image', models.ImageField(upload_to=Products.models.Products.upload_product)),
+                ('InStock', models.IntegerField(default=0)),
+                ('CreatedAt', models.DateTimeField(auto_now_add=True)),
+                ('UpdatedAt', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:13
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Products', '0003_products_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='products',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('Name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector('Description', config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), name='products_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['Name'], name='products_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
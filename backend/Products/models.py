@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 import random
 import string
 import os
@@ -24,8 +26,23 @@ class Products(models.Model):
     Costs = models.DecimalField(max_digits=10, decimal_places=2)
     Description = models.TextField(default='')
     Image = models.ImageField(upload_to=upload_product)
+    # {variant: {format: storage key}}, filled in the background by Products.funcs.generate_image_variants
+    ImageVariants = models.JSONField(default=dict)
 
     InStock = models.IntegerField(default=0)
 
     CreatedAt = models.DateTimeField(auto_now_add=True)
     UpdatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['CreatedAt'], name='products_created_idx'),
+            # Max() for the list ETag
+            models.Index(fields=['UpdatedAt'], name='products_updated_idx'),
+            # Search (Products.funcs.search_products), the expression must match SEARCH_VECTOR there
+            GinIndex(
+                SearchVector('Name', weight='A', config='simple') + SearchVector('Description', weight='B', config='simple'),
+                name='products_search_idx',
+            ),
+            GinIndex(fields=['Name'], opclasses=['gin_trgm_ops'], name='products_name_trgm_idx'),
+        ]
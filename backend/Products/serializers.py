@@ -2,6 +2,22 @@ from rest_framework import serializers
 from django.conf import settings
 from .models import Products
 from urllib.parse import urlparse, urlunparse
+from LiveFire.global_funcs import media_url
+
+
+def get_image_variant_urls(obj):
+    """
+        {variant: {format: url}} for the generated variants of the product image,
+        empty until they are generated.
+    """
+    return {
+        variant: {
+            extension: media_url(key)
+            for extension, key in formats.items()
+        }
+        for variant, formats in obj.ImageVariants.items()
+    }
+
 
 class ProductsSerializer(serializers.Serializer):
     
@@ -10,13 +26,14 @@ class ProductsSerializer(serializers.Serializer):
     Price = serializers.DecimalField(max_digits=10, decimal_places=2)
     Description = serializers.CharField()
     ImageURL = serializers.SerializerMethodField()
+    ImageVariants = serializers.SerializerMethodField()
     InStock = serializers.IntegerField()
 
     def get_ImageURL(self, obj):
-        image_url = obj.Image.url
+        return media_url(obj.Image.name)
 
-
-        return image_url.replace('http://minio:9000', '')
+    def get_ImageVariants(self, obj):
+        return get_image_variant_urls(obj)
     
 
 class ProductSerializer(serializers.Serializer):
@@ -27,10 +44,11 @@ class ProductSerializer(serializers.Serializer):
     Costs = serializers.DecimalField(max_digits=10, decimal_places=2)
     Description = serializers.CharField()
     ImageURL = serializers.SerializerMethodField()
+    ImageVariants = serializers.SerializerMethodField()
     InStock = serializers.IntegerField()
 
     def get_ImageURL(self, obj):
-        image_url = obj.Image.url
-
+        return media_url(obj.Image.name)
 
-        return image_url.replace('http://minio:9000', '')
+    def get_ImageVariants(self, obj):
+        return get_image_variant_urls(obj)
@@ -0,0 +1,15 @@
+from celery import shared_task
+from botocore.exceptions import BotoCoreError, ClientError
+
+from Products import funcs
+
+
+# Storage errors are retried, an image Pillow cannot read is not
+@shared_task(autoretry_for=(BotoCoreError, ClientError), retry_backoff=True, max_retries=5)
+def generate_image_variants(product_id):
+    funcs.generate_image_variants(product_id)
+
+
+@shared_task(autoretry_for=(BotoCoreError, ClientError), retry_backoff=True, max_retries=5)
+def delete_images(names):
+    funcs.delete_images(names)
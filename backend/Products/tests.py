@@ -1,3 +1,378 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from decimal import Decimal
+from io import BytesIO
+from PIL import Image
+from unittest import mock, skipUnless
+from botocore.stub import Stubber
+import base64
+import boto3
+import json
+
+from Auth.funcs import generate_token
+from Products.funcs import search_products, bulk_update_products, generate_image_variants, create_image_upload, check_uploaded_image
+from Products.funcs import get_catalog, invalidate_catalog
+from Customers.models import Customers
+from Orders.funcs import create_order
+from Products.models import Products
 
 # Create your tests here.
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Search uses PostgreSQL full-text and pg_trgm')
+class SearchProductsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lavender = Products.objects.create(Name='Лавандовая свеча', Description='Соевый воск', Price=10, Costs=4, Image='products/a.jpg')
+        cls.vanilla = Products.objects.create(Name='Vanilla candle', Description='Soy wax, lavender notes', Price=10, Costs=4, Image='products/b.jpg')
+        Products.objects.create(Name='Gift box', Description='', Price=10, Costs=4, Image='products/c.jpg')
+
+    def test_prefix_match(self):
+        self.assertEqual(list(search_products('лаванд')), [self.lavender])
+
+    def test_description_and_every_word(self):
+        self.assertEqual(list(search_products('lavender')), [self.vanilla])
+        self.assertEqual(list(search_products('vanil cand')), [self.vanilla])
+
+    def test_typo(self):
+        self.assertIn(self.vanilla, list(search_products('vanila')))
+
+    def test_no_words(self):
+        self.assertEqual(list(search_products('!!!')), [])
+
+
+class BulkUpdateProductsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.candle = Products.objects.create(Name='Candle', Description='', Price=10, Costs=4, Image='products/a.jpg', InStock=5)
+        cls.box = Products.objects.create(Name='Gift box', Description='', Price=3, Costs=1, Image='products/b.jpg', InStock=2)
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def post(self, rows):
+        return self.client.post('/api/v1/products/bulk_update_products/', {'products': rows}, content_type='application/json')
+
+    def test_per_row_results(self):
+        updated_at = self.candle.UpdatedAt
+
+        response = self.post([
+            {'product_id': self.candle.pk, 'Price': '12.50', 'InStockDelta': 10},
+            {'product_id': self.box.pk, 'InStock': 0, 'Costs': '1.20'},
+            {'product_id': self.box.pk, 'Price': '4'},
+            {'product_id': self.box.pk + 100, 'Price': '4'},
+            {'product_id': self.candle.pk},
+            'not a row',
+        ])
+
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()['data']['results']
+
+        self.assertEqual([result['status'] for result in results], ['updated', 'updated', 'error', 'error', 'error', 'error'])
+        self.assertEqual(results[0]['product'], {'Price': '12.50', 'Costs': '4.00', 'InStock': 15})
+        self.assertEqual(results[2]['errors'], 'Duplicate product_id')
+        self.assertEqual(results[3]['errors'], 'Product not found')
+
+        self.candle.refresh_from_db()
+        self.box.refresh_from_db()
+
+        self.assertEqual((self.candle.Price, self.candle.Costs, self.candle.InStock), (Decimal('12.50'), Decimal('4'), 15))
+        self.assertEqual((self.box.Price, self.box.Costs, self.box.InStock), (Decimal('3'), Decimal('1.20'), 0))
+        self.assertGreater(self.candle.UpdatedAt, updated_at)
+
+    def test_queries(self):
+        rows = [{'product_id': product_id, 'InStockDelta': 1} for product_id in [self.candle.pk, self.box.pk]]
+
+        # Savepoint, row locks, one UPDATE per batch, the updated values, release
+        with self.assertNumQueries(5):
+            bulk_update_products(rows)
+
+    def test_stock_cannot_go_negative(self):
+        results = self.post([{'product_id': self.box.pk, 'InStockDelta': -3}]).json()['data']['results']
+
+        self.assertEqual(results[0]['errors'], 'Not enough stock, 2 left')
+
+        self.box.refresh_from_db()
+        self.assertEqual(self.box.InStock, 2)
+
+    def test_empty(self):
+        self.assertEqual(self.post([]).status_code, 400)
+
+
+class CatalogCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.candle = Products.objects.create(Name='Candle', Description='', Price=10, Costs=4, Image='products/a.jpg', InStock=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def catalog(self):
+        return {product['id']: product for product in self.client.get('/api/v1/products/get_products/').json()['data']['products']}
+
+    def test_served_from_cache_until_invalidated(self):
+        get_catalog()
+
+        Products.objects.filter(pk=self.candle.pk).update(Name='Renamed')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_catalog()[0]['Name'], 'Candle')
+
+        invalidate_catalog()
+
+        self.assertEqual(get_catalog()[0]['Name'], 'Renamed')
+
+    def test_product_writes_invalidate(self):
+        self.assertEqual(self.catalog()[self.candle.pk]['Price'], '10.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/products/bulk_update_products/', {'products': [{'product_id': self.candle.pk, 'Price': '12'}]}, content_type='application/json')
+
+        self.assertEqual(self.catalog()[self.candle.pk]['Price'], '12.00')
+
+        self.client.delete('/api/v1/products/delete_product/', {'product_id': self.candle.pk}, content_type='application/json')
+
+        self.assertEqual(self.catalog(), {})
+
+    def test_stock_changes_invalidate_after_commit(self):
+        self.assertEqual(self.catalog()[self.candle.pk]['InStock'], 5)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_order(Customers.objects.create(Name='Customer').pk, None, {self.candle.pk: 2})
+
+            # Not invalidated before the order commits
+            self.assertEqual(self.catalog()[self.candle.pk]['InStock'], 5)
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self.catalog()[self.candle.pk]['InStock'], 3)
+
+
+IN_MEMORY_STORAGE = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def png(width, height):
+    buffer = BytesIO()
+    Image.new('RGBA', (width, height), (200, 100, 50, 128)).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGE)
+class ImageVariantsTests(TestCase):
+
+    def setUp(self):
+        self.product = Products.objects.create(
+            Name='Candle', Price=10, Costs=4, Image=default_storage.save('products/source.png', png(2000, 1000)),
+        )
+
+    def variant_files(self):
+        return sorted(default_storage.listdir('products/variants')[1])
+
+    def test_sizes_and_formats(self):
+        generate_image_variants(self.product.pk)
+
+        self.product.refresh_from_db()
+
+        self.assertEqual(set(self.product.ImageVariants), {'thumbnail', 'card', 'full'})
+
+        for variant, size in [('thumbnail', (200, 100)), ('card', (600, 300)), ('full', (1600, 800))]:
+            with default_storage.open(self.product.ImageVariants[variant]['webp']) as webp:
+                image = Image.open(webp)
+                self.assertEqual((image.format, image.size, image.mode), ('WEBP', size, 'RGBA'))
+
+            # JPEG has no alpha channel
+            with default_storage.open(self.product.ImageVariants[variant]['jpg']) as jpg:
+                image = Image.open(jpg)
+                self.assertEqual((image.format, image.size, image.mode), ('JPEG', size, 'RGB'))
+
+    def test_regeneration_deletes_replaced_variants(self):
+        generate_image_variants(self.product.pk)
+        generate_image_variants(self.product.pk)
+
+        self.product.refresh_from_db()
+
+        self.assertEqual(len(self.variant_files()), 6)
+        self.assertEqual(
+            self.variant_files(),
+            sorted(name.rsplit('/', 1)[1] for formats in self.product.ImageVariants.values() for name in formats.values()),
+        )
+
+    def test_image_replaced_meanwhile(self):
+        def replace_image(image):
+            Products.objects.filter(pk=self.product.pk).update(Image='products/other.png')
+            return image
+
+        with mock.patch('Products.funcs.ImageOps.exif_transpose', side_effect=replace_image):
+            generate_image_variants(self.product.pk)
+
+        self.product.refresh_from_db()
+
+        self.assertEqual(self.product.ImageVariants, {})
+        self.assertEqual(self.variant_files(), [])
+
+
+def s3_client():
+    return boto3.client(
+        's3', endpoint_url='http://minio:9000', region_name='us-east-1',
+        aws_access_key_id='test', aws_secret_access_key='test',
+    )
+
+
+def stub_head(client, key, length=1024, content_type='image/png'):
+    stubber = Stubber(client)
+    stubber.add_response(
+        'head_object', {'ContentLength': length, 'ContentType': content_type},
+        {'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': f'{settings.AWS_LOCATION}/{key}'},
+    )
+    return stubber
+
+
+UPLOADED_KEY = 'products/' + 'a' * 32 + '.png'
+
+
+class ImageUploadTests(TestCase):
+
+    def test_create_image_upload(self):
+        upload = create_image_upload('Photo.JPG', client=s3_client())
+
+        self.assertRegex(upload['key'], r'^products/[A-Za-z]{32}\.jpg$')
+        self.assertEqual(upload['fields']['key'], f"{settings.AWS_LOCATION}/{upload['key']}")
+        self.assertEqual(upload['fields']['Content-Type'], 'image/jpeg')
+
+        policy = json.loads(base64.b64decode(upload['fields']['policy']))
+
+        self.assertIn({'Content-Type': 'image/jpeg'}, policy['conditions'])
+        self.assertIn(['content-length-range', 1, settings.PRODUCT_IMAGE_MAX_SIZE], policy['conditions'])
+
+    def test_check_uploaded_image(self):
+        client = s3_client()
+
+        for head, error in [
+            ({}, None),
+            ({'length': settings.PRODUCT_IMAGE_MAX_SIZE + 1}, 'Image is too large'),
+            ({'content_type': 'text/html'}, 'Incorrect image type'),
+        ]:
+            with self.subTest(head=head), stub_head(client, UPLOADED_KEY, **head):
+                self.assertEqual(check_uploaded_image(UPLOADED_KEY, client=client), error)
+
+    def test_image_not_uploaded(self):
+        client = s3_client()
+
+        with Stubber(client) as stubber:
+            stubber.add_client_error('head_object', service_error_code='404', http_status_code=404)
+            self.assertEqual(check_uploaded_image(UPLOADED_KEY, client=client), 'Image not uploaded')
+
+    def test_incorrect_key(self):
+        for key in ['products/a.png', 'products/../secret.png', 'other/' + 'a' * 32 + '.png', UPLOADED_KEY[:-3] + 'gif']:
+            with self.subTest(key=key):
+                self.assertEqual(check_uploaded_image(key, client=mock.Mock()), 'Incorrect image key')
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGE)
+class AttachImageTests(TestCase):
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+        self.s3 = s3_client()
+
+        self.product = Products.objects.create(
+            Name='Candle', Price=10, Costs=4, Image=default_storage.save('products/old.png', png(800, 400)),
+        )
+        generate_image_variants(self.product.pk)
+        self.product.refresh_from_db()
+
+        default_storage.save(UPLOADED_KEY, png(800, 400))
+
+    def attach(self, key, product=None):
+        with mock.patch('Products.funcs.get_s3_client', return_value=self.s3), self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/v1/products/attach_image/', {'product_id': (product or self.product).pk, 'ImageKey': key},
+                content_type='application/json',
+            )
+
+    def test_old_image_and_variants_are_deleted(self):
+        old_names = {self.product.Image.name} | {name for formats in self.product.ImageVariants.values() for name in formats.values()}
+
+        with stub_head(self.s3, UPLOADED_KEY):
+            response = self.attach(UPLOADED_KEY)
+
+        self.assertEqual(response.status_code, 200)
+
+        self.product.refresh_from_db()
+
+        self.assertEqual(self.product.Image.name, UPLOADED_KEY)
+        self.assertEqual(set(self.product.ImageVariants), {'thumbnail', 'card', 'full'})
+        self.assertTrue(default_storage.exists(UPLOADED_KEY))
+
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name), name)
+
+    def test_key_used_by_another_product(self):
+        other = Products.objects.create(Name='Gift box', Price=3, Costs=1, Image=UPLOADED_KEY)
+
+        response = self.attach(UPLOADED_KEY)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Image is used by another product')
+
+        old_name = self.product.Image.name
+        self.product.refresh_from_db()
+
+        self.assertEqual(self.product.Image.name, old_name)
+        self.assertTrue(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(other.Image.name))
+
+    def test_shared_original_is_kept(self):
+        Products.objects.create(
+            Name='Gift box', Price=3, Costs=1, Image=self.product.Image.name, ImageVariants=self.product.ImageVariants,
+        )
+
+        with stub_head(self.s3, UPLOADED_KEY):
+            self.attach(UPLOADED_KEY)
+
+        self.assertTrue(default_storage.exists(self.product.Image.name))
+
+        for formats in self.product.ImageVariants.values():
+            for name in formats.values():
+                self.assertTrue(default_storage.exists(name), name)
+
+    def test_deleted_product_images_are_deleted(self):
+        names = {self.product.Image.name} | {name for formats in self.product.ImageVariants.values() for name in formats.values()}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/v1/products/delete_product/', {'product_id': self.product.pk}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+
+        for name in names:
+            self.assertFalse(default_storage.exists(name), name)
+
+    def test_create_with_key_in_use(self):
+        response = self.client.post('/api/v1/products/create_product/', {
+            'Name': 'Gift box', 'Price': '3', 'Costs': '1', 'Description': 'Box', 'InStock': '1', 'ImageKey': self.product.Image.name,
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['data']['error'], {'ImageKey': ['Image is used by another product']})
+        self.assertEqual(Products.objects.count(), 1)
+
+    def test_image_not_uploaded(self):
+        with Stubber(self.s3) as stubber:
+            stubber.add_client_error('head_object', service_error_code='404', http_status_code=404)
+            response = self.attach(UPLOADED_KEY)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(default_storage.exists(self.product.Image.name))
@@ -20,9 +20,14 @@ from . import views
 
 urlpatterns = [
     path('get_products/', views.ProductsView.as_view(), name='get_products'),
+    path('search_products/', views.SearchProductsView.as_view(), name='search_products'),
     
     path('create_product/', views.ProductView.as_view(), name='create_product'),
     path('get_product/', views.ProductView.as_view(), name='get_product'),
     path('update_product/', views.ProductView.as_view(), name='update_product'),
     path('delete_product/', views.ProductView.as_view(), name='delete_product'),
+    path('bulk_update_products/', views.BulkUpdateProductsView.as_view(), name='bulk_update_products'),
+
+    path('create_image_upload/', views.ImageUploadView.as_view(), name='create_image_upload'),
+    path('attach_image/', views.AttachImageView.as_view(), name='attach_image'),
 ]
@@ -1,26 +1,49 @@
 from rest_framework.views import APIView
 from rest_framework import status
+from django.db import transaction
+from django.views import View
 
 from Products.models import Products
 from Products.serializers import ProductsSerializer, ProductSerializer
-from Products.forms import ProductsForm, ProductUpdateForm
+from Products.forms import ProductsForm, ProductUpdateForm, ImageUploadForm, AttachImageForm
+from Products.funcs import aget_catalog, invalidate_catalog, schedule_image_variants, create_image_upload, check_uploaded_image, search_products, bulk_update_products, BULK_UPDATE_MAX_ROWS
+from Products.funcs import product_image_names, schedule_image_deletion
+from Sync.models import Tombstones
+from Sync.funcs import record_deletions
 
-from LiveFire.global_funcs import auth_required, standard_response
+from LiveFire.global_funcs import auth_required, standard_response, standard_json_response
 from LiveFire import global_funcs
 
 # Create your views here.
 
 @auth_required()
-class ProductsView(APIView):
-    def get(self, request):
-
-        products = Products.objects.all()
+class ProductsView(View):
+    async def get(self, request):
 
-        serializer = ProductsSerializer(products, many=True)
+        async def build_response():
+            return standard_json_response(data={'products': await aget_catalog()})
 
-        return standard_response(data={'products': serializer.data})
+        return await global_funcs.aconditional_list_response(request, Products.objects.all(), build_response)
     
 
+@auth_required()
+class SearchProductsView(View):
+    async def get(self, request):
+
+        fields = ['q']
+
+        if global_funcs.check_fileds_in_request(request, "GET", fields) and request.GET.get('q').strip():
+
+            page, next_cursor = await global_funcs.aoffset_paginate(search_products(request.GET.get('q').strip()), request)
+
+            if page is None:
+                return standard_json_response(message='Incorrect cursor or limit', status_code=status.HTTP_400_BAD_REQUEST)
+
+            return standard_json_response(data=ProductsSerializer(page, many=True).data, next=next_cursor)
+
+        return standard_json_response(message='Incorrect fields', status_code=status.HTTP_400_BAD_REQUEST)
+
+
 @auth_required()
 class ProductView(APIView):
 
@@ -48,17 +71,35 @@ class ProductView(APIView):
         form = ProductsForm(request.POST, request.FILES)
 
         if form.is_valid():
+
+            image = form.cleaned_data['Image']
+
+            if not image:
+
+                if Products.objects.filter(Image=form.cleaned_data['ImageKey']).exists():
+                    return standard_response(data={'error': {'ImageKey': ['Image is used by another product']}}, status_code=status.HTTP_400_BAD_REQUEST)
+
+                error = check_uploaded_image(form.cleaned_data['ImageKey'])
+
+                if error:
+                    return standard_response(data={'error': {'ImageKey': [error]}}, status_code=status.HTTP_400_BAD_REQUEST)
+
+                image = form.cleaned_data['ImageKey']
             
             product = Products(
                 Name=form.cleaned_data['Name'],
                 Price=form.cleaned_data['Price'],
                 Costs=form.cleaned_data['Costs'],
                 Description=form.cleaned_data['Description'],
-                Image=form.cleaned_data['Image'],
+                Image=image,
                 InStock=form.cleaned_data['InStock']
             )
 
             product.save()
+
+            schedule_image_variants(product.pk)
+
+            invalidate_catalog()
             
             return standard_response(message='Product created successfully')
         
@@ -67,7 +108,7 @@ class ProductView(APIView):
 
     def put(self, request):
 
-        form = ProductUpdateForm(request.POST)
+        form = ProductUpdateForm(request.POST, request.FILES)
 
         if form.is_valid():
 
@@ -84,11 +125,19 @@ class ProductView(APIView):
                 if form.cleaned_data.get('Description') is not None:
                     product.Description = form.cleaned_data['Description']
                 if form.cleaned_data.get('Image') is not None:
+                    replaced_images = product_image_names(product)
                     product.Image = form.cleaned_data['Image']
+                    product.ImageVariants = {}
                 if form.cleaned_data.get('InStock') is not None:
                     product.InStock = form.cleaned_data['InStock']
                 product.save()
 
+                if form.cleaned_data.get('Image') is not None:
+                    schedule_image_variants(product.pk)
+                    schedule_image_deletion(replaced_images)
+
+                invalidate_catalog()
+
                 return standard_response(message='Product updated')
             
             else:
@@ -109,8 +158,88 @@ class ProductView(APIView):
 
                     product = Products.objects.get(id=request.data.get('product_id'))
 
-                    product.delete()
+                    with transaction.atomic():
+                        record_deletions(Tombstones.ModelChoices.PRODUCTS, [product.pk])
+                        schedule_image_deletion(product_image_names(product))
+                        product.delete()
+
+                    invalidate_catalog()
 
                     return standard_response(message='Product deleted successfully')
         
-        return standard_response(message='Product not found', status_code=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return standard_response(message='Product not found', status_code=status.HTTP_404_NOT_FOUND)
+
+
+@auth_required()
+class BulkUpdateProductsView(APIView):
+    def post(self, request):
+
+        # JSON body: {"products": [{"product_id": 1, "Price": "12.50", "InStockDelta": 20}, ...]}
+        rows = request.data.get('products') if isinstance(request.data, dict) else None
+
+        if not isinstance(rows, list) or not rows:
+            return standard_response(message='Expected a non-empty products list', status_code=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) > BULK_UPDATE_MAX_ROWS:
+            return standard_response(message=f'At most {BULK_UPDATE_MAX_ROWS} products per request', status_code=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk_update_products(rows)
+
+        return standard_response(data={
+            'results': results,
+            'updated': sum(result['status'] == 'updated' for result in results),
+        })
+
+
+@auth_required()
+class ImageUploadView(APIView):
+    def post(self, request):
+
+        form = ImageUploadForm(request.data)
+
+        if form.is_valid():
+
+            # The browser uploads straight to MinIO, then attaches the key
+            return standard_response(data=create_image_upload(form.cleaned_data['filename']))
+
+        return standard_response(data=form.errors, status_code=status.HTTP_400_BAD_REQUEST)
+
+
+@auth_required()
+class AttachImageView(APIView):
+    def post(self, request):
+
+        form = AttachImageForm(request.data)
+
+        if form.is_valid():
+
+            product = Products.objects.filter(pk=form.cleaned_data['product_id']).first()
+
+            if product is None:
+                return standard_response(message='Product not found', status_code=status.HTTP_404_NOT_FOUND)
+
+            if product.Image.name == form.cleaned_data['ImageKey']:
+                return standard_response(message='Image already attached')
+
+            if Products.objects.filter(Image=form.cleaned_data['ImageKey']).exclude(pk=product.pk).exists():
+                return standard_response(message='Image is used by another product', status_code=status.HTTP_400_BAD_REQUEST)
+
+            error = check_uploaded_image(form.cleaned_data['ImageKey'])
+
+            if error:
+                return standard_response(message=error, status_code=status.HTTP_400_BAD_REQUEST)
+
+            replaced_images = product_image_names(product)
+
+            product.Image = form.cleaned_data['ImageKey']
+            product.ImageVariants = {}
+            product.save(update_fields=['Image', 'ImageVariants', 'UpdatedAt'])
+
+            schedule_image_variants(product.pk)
+            schedule_image_deletion(replaced_images)
+
+            invalidate_catalog()
+
+            return standard_response(message='Image attached')
+
+        return standard_response(data=form.errors, status_code=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,220 @@
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+
+from Sync.models import Tombstones
+from Orders.models import Orders
+from Products.models import Products
+from Customers.models import Customers
+from Orders.serializers import OrdersSerializer
+from Products.serializers import ProductsSerializer
+from Customers.serializers import CustomersSerializer
+from LiveFire.global_funcs import encode_cursor, decode_cursor
+from LiveFire.metrics import serialize_timer
+
+
+# A row's UpdatedAt is taken before its transaction commits, so rows can become visible with
+# timestamps older than a token already handed out. Tokens therefore stop at the start of the
+# oldest open transaction (see sync_cutoff), minus SYNC_SETTLE for clock skew between the app
+# and the database and for the moment between taking a timestamp and starting to write.
+# Rows after the cutoff are still sent, then again on the next pull; clients upsert by id.
+SYNC_SETTLE = timedelta(seconds=5)
+
+# Tombstones are kept this long, older tokens get a full resync
+SYNC_RETENTION = timedelta(days=30)
+
+SYNC_PAGE_SIZE = 500
+
+
+def _feeds():
+
+    """
+        (name, queryset, date field, serializer) of every feed, in token order.
+    """
+
+    return [
+        (
+            'orders',
+            Orders.objects.annotate(CustomerName=F('Customer__Name')).only(
+                'id', 'OrderDate', 'DueDate', 'OrderStatus', 'OrderTotal', 'UpdatedAt'
+            ),
+            'UpdatedAt',
+            lambda rows: OrdersSerializer(rows, many=True).data,
+        ),
+        ('products', Products.objects.all(), 'UpdatedAt', lambda rows: ProductsSerializer(rows, many=True).data),
+        ('customers', Customers.objects.all(), 'UpdatedAt', lambda rows: CustomersSerializer(rows, many=True).data),
+        (
+            'deleted',
+            Tombstones.objects.all(),
+            'DeletedAt',
+            lambda rows: [{'model': row.Model, 'id': row.ObjectId} for row in rows],
+        ),
+    ]
+
+
+def decode_token(token):
+
+    """
+        {feed: (date, id)} from a changes token, every position None without a token (full sync).
+        None for a malformed token or one older than SYNC_RETENTION.
+    """
+
+    names = [name for name, *_ in _feeds()]
+
+    if not token:
+        return {name: None for name in names}
+
+    values = decode_cursor(token, len(names) * 2)
+
+    if values is None:
+        return None
+
+    positions = {}
+    oldest = timezone.now() - SYNC_RETENTION
+
+    for index, name in enumerate(names):
+
+        date, last_id = values[index * 2], values[index * 2 + 1]
+        date = parse_datetime(date) if isinstance(date, str) else None
+
+        if date is None or not isinstance(last_id, int) or date < oldest:
+            return None
+
+        positions[name] = (date, last_id)
+
+    return positions
+
+
+def _page_query(queryset, date_field, position, limit):
+
+    if position is not None:
+        date, last_id = position
+        queryset = queryset.filter(Q(**{f'{date_field}__gt': date}) | Q(**{date_field: date, 'id__gt': last_id}))
+
+    return queryset.order_by(date_field, 'id')[:limit + 1]
+
+
+def _advance(rows, date_field, position, cutoff):
+
+    for row in rows:
+        if getattr(row, date_field) <= cutoff:
+            position = (getattr(row, date_field), row.pk)
+
+    return position
+
+
+# application_name of transactions that write nothing (see mark_read_only), which cannot
+# commit rows older than a token and so do not hold tokens back
+READ_ONLY_APPLICATION_NAME = 'livefire-read-only'
+
+
+def mark_read_only():
+
+    """
+        Leaves the current transaction out of oldest_open_transaction, for long transactions that
+        only read (e.g. the order export) and would otherwise pin sync_cutoff while they run.
+        PostgreSQL only; reverts when the transaction ends.
+    """
+
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL application_name = %s', [READ_ONLY_APPLICATION_NAME])
+
+
+def oldest_open_transaction():
+
+    """
+        Start of the oldest transaction of another session that is still open, None when there is
+        none or the database cannot tell (anything but PostgreSQL).
+        Every row such a transaction writes has a timestamp after its start.
+    """
+
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend' "
+            "AND application_name <> %s",
+            [READ_ONLY_APPLICATION_NAME],
+        )
+        return cursor.fetchone()[0]
+
+
+def sync_cutoff():
+
+    """
+        Latest time up to which every change is committed and visible.
+    """
+
+    cutoff = timezone.now()
+    oldest = oldest_open_transaction()
+
+    if oldest is not None and oldest < cutoff:
+        cutoff = oldest
+
+    return cutoff - SYNC_SETTLE
+
+
+async def aget_changes(positions, limit=SYNC_PAGE_SIZE):
+
+    """
+        Rows of every feed changed after `positions` (see decode_token), at most `limit` per feed,
+        oldest first. Returns (data, next token, whether any feed has more rows).
+        has_more is only true when the token moved, so pulling while it is true always ends.
+    """
+
+    cutoff = await sync_to_async(sync_cutoff)()
+
+    data = {}
+    token = []
+    has_more = False
+
+    for name, queryset, date_field, serialize in _feeds():
+
+        position = positions[name]
+
+        rows = [row async for row in _page_query(queryset, date_field, position, limit)]
+        more = len(rows) > limit
+
+        if more:
+            rows = rows[:limit]
+
+        with serialize_timer():
+            data[name] = serialize(rows)
+
+        settled = _advance(rows, date_field, position, cutoff)
+
+        # The whole page is after the cutoff (e.g. while a long transaction is open): pulling
+        # again would return the same page, the rest comes once the cutoff moves past it
+        if settled == position:
+            more = False
+
+        # Every row up to the cutoff has been sent, the next pull can start there
+        if not more:
+            settled = (cutoff, 0) if settled is None else max(settled, (cutoff, 0))
+
+        has_more = has_more or more
+        token += list(settled)
+
+    return data, encode_cursor(*token), has_more
+
+
+def record_deletions(model, ids):
+
+    """
+        Tombstones for hard-deleted rows of `model` ('products' or 'customers').
+        Call in the transaction that deletes them.
+    """
+
+    Tombstones.objects.bulk_create([Tombstones(Model=model, ObjectId=object_id) for object_id in ids])
+
+
+def prune_tombstones():
+    return Tombstones.objects.filter(DeletedAt__lt=timezone.now() - SYNC_RETENTION).delete()[0]
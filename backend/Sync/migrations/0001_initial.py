@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Model', models.CharField(choices=[('products', 'Products'), ('customers', 'Customers')], max_length=255)),
+                ('ObjectId', models.BigIntegerField()),
+                ('DeletedAt', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['DeletedAt', 'id'], name='tombstones_deleted_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import models
+
+# Create your models here.
+
+
+class Tombstones(models.Model):
+
+    """
+        Hard-deleted products and customers, so the changes feed can tell clients to drop them.
+        Written by Sync.funcs.record_deletions, pruned after SYNC_RETENTION.
+    """
+
+    class ModelChoices(models.TextChoices):
+        PRODUCTS = 'products', 'Products'
+        CUSTOMERS = 'customers', 'Customers'
+
+    Model = models.CharField(max_length=255, choices=ModelChoices.choices)
+    ObjectId = models.BigIntegerField()
+
+    DeletedAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['DeletedAt', 'id'], name='tombstones_deleted_idx'),
+        ]
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from Sync import funcs
+
+
+@shared_task(ignore_result=False)
+def prune_tombstones():
+    return funcs.prune_tombstones()
@@ -0,0 +1,184 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from asgiref.sync import async_to_sync
+from datetime import timedelta
+from urllib.parse import urlencode
+from unittest import mock, skipUnless
+
+from Auth.funcs import generate_token
+from Customers.models import Customers
+from Orders.models import Orders
+from Products.models import Products
+from Sync.funcs import READ_ONLY_APPLICATION_NAME, aget_changes, decode_token, oldest_open_transaction
+
+# Create your tests here.
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+@mock.patch('Sync.funcs.SYNC_SETTLE', timedelta(0))
+class ChangesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customers.objects.create(Name='Customer')
+        cls.other_customer = Customers.objects.create(Name='Other')
+        cls.product = Products.objects.create(Name='Candle', Price=10, Costs=4, Image='products/a.jpg')
+        cls.order = Orders.objects.create(
+            Customer=cls.customer,
+            OrderStatus=Orders.OrderStatusChoices.IN_PROGRESS,
+            OrderTotal=10,
+            OrderCosts=4,
+        )
+
+    def setUp(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {generate_token(1)}'
+
+    def pull(self, since=None):
+        response = self.client.get('/api/v1/sync/changes/', {'since': since} if since else {})
+
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def test_initial_then_delta(self):
+        initial = self.pull()
+
+        self.assertEqual([row['id'] for row in initial['data']['orders']], [self.order.pk])
+        self.assertEqual(len(initial['data']['customers']), 2)
+        self.assertFalse(initial['has_more'])
+
+        # Nothing changed since
+        unchanged = self.pull(initial['next'])
+
+        self.assertEqual(unchanged['data'], {'orders': [], 'products': [], 'customers': [], 'deleted': []})
+
+        self.client.delete('/api/v1/orders/delete_order/', {'order_id': str(self.order.pk)}, content_type='application/json')
+        self.client.delete('/api/v1/customers/delete_customer/', {'customer_id': self.other_customer.pk}, content_type='application/json')
+
+        delta = self.pull(unchanged['next'])
+
+        self.assertEqual([(row['id'], row['OrderStatus']) for row in delta['data']['orders']], [(self.order.pk, 'cancelled')])
+        self.assertEqual(delta['data']['deleted'], [{'model': 'customers', 'id': self.other_customer.pk}])
+        self.assertEqual(delta['data']['products'], [])
+
+    def test_pages(self):
+        Customers.objects.bulk_create([Customers(Name=f'Customer {i}') for i in range(5)])
+
+        positions = decode_token(None)
+        seen = []
+
+        while True:
+            data, token, has_more = async_to_sync(aget_changes)(positions, limit=2)
+            seen += [row['id'] for row in data['customers']]
+            positions = decode_token(token)
+
+            if not has_more:
+                break
+
+        self.assertEqual(sorted(seen), sorted(Customers.objects.values_list('pk', flat=True)))
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/v1/sync/changes/', {'since': 'garbage'})
+
+        self.assertEqual(response.status_code, 410)
+
+    def test_token_stops_at_open_transactions(self):
+        initial = self.pull()
+
+        self.order.OrderStatus = Orders.OrderStatusChoices.PACKED
+        self.order.save()
+
+        # Another transaction started before the change is still open, it may commit older rows
+        with mock.patch('Sync.funcs.oldest_open_transaction', return_value=self.order.UpdatedAt - timedelta(seconds=1)):
+            first = self.pull(initial['next'])
+
+        second = self.pull(first['next'])
+
+        self.assertEqual([row['id'] for row in first['data']['orders']], [self.order.pk])
+        self.assertEqual([row['id'] for row in second['data']['orders']], [self.order.pk])
+        self.assertEqual(self.pull(second['next'])['data']['orders'], [])
+
+
+    def test_pinned_cutoff_does_not_loop(self):
+        positions = decode_token(self.pull()['next'])
+        pinned = timezone.now()
+
+        Customers.objects.bulk_create([Customers(Name=f'Customer {i}') for i in range(5)])
+
+        # A transaction that started before the new customers stays open
+        with mock.patch('Sync.funcs.oldest_open_transaction', return_value=pinned):
+            data, token, has_more = async_to_sync(aget_changes)(positions, limit=2)
+
+        self.assertEqual(len(data['customers']), 2)
+        self.assertFalse(has_more)
+
+        seen = []
+
+        for _ in range(10):
+            data, next_token, has_more = async_to_sync(aget_changes)(decode_token(token), limit=2)
+            seen += [row['Name'] for row in data['customers']]
+
+            if not has_more:
+                break
+
+            # Pulling again while has_more is true always makes progress
+            self.assertNotEqual(next_token, token)
+            token = next_token
+
+        self.assertFalse(has_more)
+        self.assertEqual(sorted(set(seen)), [f'Customer {i}' for i in range(5)])
+
+    def test_renamed_customer_resends_orders(self):
+        initial = self.pull()
+
+        self.client.put(
+            '/api/v1/customers/update_customer/', urlencode({'customer_id': self.customer.pk, 'Name': 'Renamed'}),
+            content_type='application/x-www-form-urlencoded',
+        )
+
+        delta = self.pull(initial['next'])
+
+        self.assertEqual([(row['id'], row['CustomerName']) for row in delta['data']['orders']], [(self.order.pk, 'Renamed')])
+
+        self.client.delete('/api/v1/customers/delete_customer/', {'customer_id': self.customer.pk}, content_type='application/json')
+
+        delta = self.pull(delta['next'])
+
+        self.assertEqual([(row['id'], row['CustomerName']) for row in delta['data']['orders']], [(self.order.pk, None)])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Open transactions are read from pg_stat_activity')
+class OldestOpenTransactionTests(TestCase):
+
+    def test_other_session(self):
+        other = connection.get_new_connection(connection.get_connection_params())
+
+        try:
+            with other.cursor() as cursor:
+                # psycopg2 opens a transaction with the first statement
+                cursor.execute('SELECT now()')
+                started = cursor.fetchone()[0]
+
+            self.assertEqual(oldest_open_transaction(), started)
+        finally:
+            other.close()
+
+    def test_read_only_transactions_are_ignored(self):
+        other = connection.get_new_connection(connection.get_connection_params())
+
+        try:
+            with other.cursor() as cursor:
+                cursor.execute('SELECT now()')
+                cursor.execute('SET LOCAL application_name = %s', [READ_ONLY_APPLICATION_NAME])
+
+            # pg_stat_activity is read once per transaction, and the test case's transaction spans its tests
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_stat_clear_snapshot()')
+
+            self.assertIsNone(oldest_open_transaction())
+        finally:
+            other.close()
@@ -0,0 +1,27 @@
+from rest_framework import status
+from django.views import View
+
+from Sync.funcs import decode_token, aget_changes
+
+from LiveFire.global_funcs import auth_required, standard_json_response
+
+# Create your views here.
+
+@auth_required()
+class ChangesView(View):
+    async def get(self, request):
+
+        """
+            Orders, products and customers created or changed after ?since=<token>, and ids of
+            deleted products and customers. Without a token returns everything (initial sync).
+            Pull again with `next` while `has_more` is true, later whenever the client wants to refresh.
+        """
+
+        positions = decode_token(request.GET.get('since'))
+
+        if positions is None:
+            return standard_json_response(message='Invalid or expired token, sync from scratch', status_code=status.HTTP_410_GONE)
+
+        data, next_token, has_more = await aget_changes(positions)
+
+        return standard_json_response(data=data, next=next_token, has_more=has_more)
@@ -25,6 +25,7 @@ interface Product {
   Name: string
   Price: string
   ImageURL: string
+  ImageVariants?: Record<string, Record<string, string>>
   InStock: number
 }
 
@@ -44,7 +45,6 @@ function NewOrderPage() {
   const [productSearchTerm, setProductSearchTerm] = useState('')
   const [customerSearchTerm, setCustomerSearchTerm] = useState('')
   const [selectedProducts, setSelectedProducts] = useState<SelectedProduct[]>([])
-  const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [customerType, setCustomerType] = useState('existing')
   const [selectedCustomerId, setSelectedCustomerId] = useState<number | null>(null)
@@ -52,49 +52,75 @@ function NewOrderPage() {
   const [dueDate, setDueDate] = useState<Date | undefined>(undefined)
   const [pinnedCustomerId, setPinnedCustomerId] = useState<number | null>(null);
 
+  // Products and customers are searched on the server as the user types,
+  // instead of downloading the whole catalog and customer list
   useEffect(() => {
-    fetchProducts()
-    fetchCustomers()
-  }, [])
+    const term = productSearchTerm.trim()
+    if (term.length < 2) {
+      setProducts([])
+      return
+    }
+    // Aborted when the term changes, so a slow reply for an older term is never shown
+    const controller = new AbortController()
+    const timeout = setTimeout(() => searchProducts(term, controller.signal), 250)
+    return () => {
+      clearTimeout(timeout)
+      controller.abort()
+    }
+  }, [productSearchTerm])
+
+  useEffect(() => {
+    const term = customerSearchTerm.trim()
+    if (term.length < 2) {
+      setCustomers([])
+      return
+    }
+    const controller = new AbortController()
+    const timeout = setTimeout(() => searchCustomers(term, controller.signal), 250)
+    return () => {
+      clearTimeout(timeout)
+      controller.abort()
+    }
+  }, [customerSearchTerm])
 
-  const fetchProducts = async () => {
+  const searchProducts = async (term: string, signal: AbortSignal) => {
     try {
-      const response = await authenticatedFetch('/api/v1/products/get_products/')
+      const response = await authenticatedFetch(`/api/v1/products/search_products/?q=${encodeURIComponent(term)}`, { signal })
       if (!response.ok) {
-        throw new Error('Failed to fetch products')
+        throw new Error('Failed to search products')
       }
       const data = await response.json()
-      setProducts(data.data.products)
+      if (!signal.aborted) {
+        setProducts(data.data)
+      }
     } catch (error) {
-      console.error('Error fetching products:', error)
+      if (signal.aborted) {
+        return
+      }
+      console.error('Error searching products:', error)
       setError('Failed to load products')
-    } finally {
-      setLoading(false)
     }
   }
 
-  const fetchCustomers = async () => {
+  const searchCustomers = async (term: string, signal: AbortSignal) => {
     try {
-      const response = await authenticatedFetch('/api/v1/customers/get_customers/')
+      const response = await authenticatedFetch(`/api/v1/customers/search_customers/?q=${encodeURIComponent(term)}`, { signal })
       if (!response.ok) {
-        throw new Error('Failed to fetch customers')
+        throw new Error('Failed to search customers')
       }
       const data = await response.json()
-      setCustomers(data.data)
+      if (!signal.aborted) {
+        setCustomers(data.data)
+      }
     } catch (error) {
-      console.error('Error fetching customers:', error)
+      if (signal.aborted) {
+        return
+      }
+      console.error('Error searching customers:', error)
       setError('Failed to load customers')
     }
   }
 
-  const filteredProducts = products.filter(product =>
-    product.Name.toLowerCase().includes(productSearchTerm.toLowerCase())
-  )
-
-  const filteredCustomers = customers.filter(customer =>
-    customer.Name.toLowerCase().includes(customerSearchTerm.toLowerCase())
-  )
-
   const addProduct = (product: Product) => {
     setSelectedProducts(prev => {
       const existing = prev.find(p => p.id === product.id)
@@ -207,10 +233,6 @@ function NewOrderPage() {
     }
   }, [pinnedCustomerId]);
 
-  if (loading) {
-    return <div>Loading...</div>
-  }
-
   return (
     <div className="p-6 space-y-6">
       <h1 className="text-3xl font-bold">Новый заказ</h1>
@@ -243,7 +265,7 @@ function NewOrderPage() {
 
               <ScrollArea className="h-[50vh] pr-4">
                 <div className="space-y-3">
-                  {filteredProducts.map(product => (
+                  {products.map(product => (
                     <div
                       key={product.id}
                       className="flex items-center justify-between p-3 border bg-white rounded-lg"
@@ -251,7 +273,7 @@ function NewOrderPage() {
                       <div className="flex items-center gap-3">
                         <div className="relative w-12 h-12">
                           <Image
-                            src={`http://localhost:9000${product.ImageURL}`}
+                            src={`http://localhost:9000${product.ImageVariants?.thumbnail?.webp ?? product.ImageURL}`}
                             alt={product.Name}
                             width={48}
                             height={48}
@@ -289,7 +311,7 @@ function NewOrderPage() {
                         <div className="flex items-center gap-3">
                           <div className="relative w-12 h-12">
                             <Image
-                              src={`http://localhost:9000${product.ImageURL}`}
+                              src={`http://localhost:9000${product.ImageVariants?.thumbnail?.webp ?? product.ImageURL}`}
                               alt={product.Name}
                               width={48}
                               height={48}
@@ -373,7 +395,7 @@ function NewOrderPage() {
                 />
               </div>
               <ScrollArea className="h-40 border rounded-md bg-white p-2" id="customerList">
-                {filteredCustomers.sort((a, b) => {
+                {[...customers].sort((a, b) => {
                   if (a.id === pinnedCustomerId) return -1;
                   if (b.id === pinnedCustomerId) return 1;
                   return 0;
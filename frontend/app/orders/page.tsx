@@ -20,6 +20,7 @@ interface Order {
 
 export default function OrdersPage() {
   const [orders, setOrders] = useState<Order[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [filterType, setFilterType] = useState('all')
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
@@ -29,14 +30,16 @@ export default function OrdersPage() {
     fetchOrders()
   }, [filterType])
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (cursor: string | null = null) => {
     try {
-      const response = await authenticatedFetch(`/api/v1/orders/get_orders/?type=${filterType}`)
+      const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''
+      const response = await authenticatedFetch(`/api/v1/orders/get_orders/?type=${filterType}${cursorParam}`)
       if (!response.ok) {
         throw new Error('Failed to fetch orders')
       }
       const data = await response.json()
-      setOrders(data.data)
+      setOrders(cursor ? (prev) => [...prev, ...data.data] : data.data)
+      setNextCursor(data.next)
       setLoading(false)
     } catch (error) {
       console.error('Error fetching orders:', error)
@@ -140,6 +143,14 @@ export default function OrdersPage() {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <div className="flex justify-center mt-6">
+          <Button variant="outline" onClick={() => fetchOrders(nextCursor)}>
+            Показать еще
+          </Button>
+        </div>
+      )}
     </div>
   )
 }
@@ -38,6 +38,35 @@ export default function CreateProductPage() {
     }
   }
 
+  // The image goes straight to MinIO with a presigned POST, only its key is sent to the backend
+  const uploadImage = async (file: File) => {
+    const response = await authenticatedFetch('/api/v1/products/create_image_upload/', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name }),
+    })
+
+    if (!response.ok) {
+      throw new Error('Допустимые форматы файлов: PNG, JPG, JPEG.')
+    }
+
+    const { data } = await response.json()
+
+    const uploadData = new FormData()
+    for (const [key, value] of Object.entries(data.fields as Record<string, string>)) {
+      uploadData.append(key, value)
+    }
+    uploadData.append('file', file)
+
+    const uploadResponse = await fetch(data.url, { method: 'POST', body: uploadData })
+
+    if (!uploadResponse.ok) {
+      throw new Error('An error occurred while uploading the image.')
+    }
+
+    return data.key as string
+  }
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault()
     setError(null)
@@ -47,11 +76,12 @@ export default function CreateProductPage() {
     for (const [key, value] of Object.entries(formData)) {
       formDataToSend.append(key, value)
     }
-    if (image) {
-      formDataToSend.append('Image', image)
-    }
 
     try {
+      if (image) {
+        formDataToSend.append('ImageKey', await uploadImage(image))
+      }
+
       const response = await authenticatedFetch('/api/v1/products/create_product/', {
         method: 'POST',
         body: formDataToSend,
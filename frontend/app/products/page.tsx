@@ -16,6 +16,7 @@ interface Product {
   Costs: string
   Description: string
   ImageURL: string
+  ImageVariants?: Record<string, Record<string, string>>
   InStock: number
 }
 
@@ -78,7 +79,7 @@ export default function ProductsPage() {
               <CardContent className="p-4">
                 <div className="relative aspect-square mb-4">
                   <Image
-                    src={`http://localhost:9000${product.ImageURL}`}
+                    src={`http://localhost:9000${product.ImageVariants?.card?.webp ?? product.ImageURL}`}
                     alt={product.Name}
                     layout="fill"
                     objectFit="cover"